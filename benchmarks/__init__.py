@@ -0,0 +1,5 @@
+"""
+Benchmarks for the dashboards' XNAT data paths against a local mock XNAT server.
+
+Run ``python -m benchmarks.run --help`` from the repository root.
+"""
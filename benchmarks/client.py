@@ -0,0 +1,35 @@
+"""
+A minimal stand-in for an XNATpy session.
+
+The dashboard_utils loaders only call ``get_json``, ``get`` and the
+``interface`` requests session, so benchmarks can point them at the mock
+server without logging in through XNATpy.
+"""
+import requests
+
+
+class RestConnection:
+    """The subset of ``xnat.session.XNATSession`` used by dashboard_utils, over plain requests."""
+
+    def __init__(self, base_url, session=None, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.interface = session or requests.Session()
+        self.timeout = timeout
+
+    def get(self, path, format=None, query=None, accepted_status=None, timeout=None, headers=None):
+        query = dict(query or {})
+        if format is not None:
+            query['format'] = format
+
+        response = self.interface.get(
+            self.base_url + path, params=query, headers=headers, timeout=timeout or self.timeout,
+        )
+        if response.status_code not in (accepted_status or [200]):
+            raise requests.HTTPError(f'{response.status_code} for {response.url}', response=response)
+        return response
+
+    def get_json(self, uri, query=None, accepted_status=None):
+        return self.get(uri, query=query, accepted_status=accepted_status).json()
+
+    def close(self):
+        self.interface.close()
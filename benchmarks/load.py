@@ -0,0 +1,105 @@
+"""
+Load test for the callbacks of a running Dash app.
+
+Reads the app's layout and callback list, then has ``--concurrency`` threads
+post callback requests for ``--duration`` seconds and reports requests per
+second and latency percentiles per callback. Dropdown and RadioItems inputs
+cycle through their options, so the app's caches do not answer every request.
+Each worker process keeps its own callback caches, so give the load a
+``--warmup`` period, which is not measured, before comparing servers::
+
+    python dash/app.py &                                  # development server
+    python dash/serve.py dash/app.py --workers 4 &        # preloaded workers
+    python -m benchmarks.load http://localhost:8050/ --concurrency 16 --warmup 30 --duration 20
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+
+import numpy as np
+import requests
+
+from dashboard_utils.dash_callbacks import server_callbacks
+
+
+def discover_callbacks(base_url, session, match=None):
+    layout = session.get(f'{base_url}_dash-layout').json()
+    dependencies = session.get(f'{base_url}_dash-dependencies').json()
+    return server_callbacks(layout, dependencies, match)
+
+
+def run_load(base_url, callbacks, concurrency, duration):
+    """Post callback requests round-robin from ``concurrency`` threads; return the latencies per callback."""
+    results = {callback.output: {'durations': [], 'errors': 0} for callback in callbacks}
+    order = itertools.cycle(callbacks)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            with lock:
+                callback = next(order)
+            body = json.dumps(callback.body())
+            started = time.perf_counter()
+            try:
+                response = session.post(f'{base_url}_dash-update-component', data=body,
+                                        headers={'Content-Type': 'application/json'}, timeout=60)
+                ok = response.status_code in (200, 204)
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    results[callback.output]['durations'].append(elapsed)
+                else:
+                    results[callback.output]['errors'] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def print_table(results, elapsed):
+    print(f"{'callback':<40}{'n':>7}{'err':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    total = 0
+    for output, result in results.items():
+        durations = np.array(result['durations']) * 1000
+        total += len(durations)
+        if not len(durations):
+            print(f"{output[:39]:<40}{0:>7}{result['errors']:>6}")
+            continue
+        print(f"{output[:39]:<40}{len(durations):>7}{result['errors']:>6}{len(durations) / elapsed:>9.1f}"
+              f"{np.percentile(durations, 50):>10.1f}{np.percentile(durations, 95):>10.1f}"
+              f"{np.percentile(durations, 99):>10.1f}")
+    print(f"{'total':<40}{total:>7}{'':>6}{total / elapsed:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the callbacks of a running Dash app.')
+    parser.add_argument('url', help='Base URL the app serves its routes under, e.g. http://localhost:8050/')
+    parser.add_argument('--concurrency', type=int, default=16, help='Simultaneous clients (default: 16)')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds to measure (default: 20)')
+    parser.add_argument('--warmup', type=float, default=0, help='Seconds of load before measuring (default: 0)')
+    parser.add_argument('--callback', help='Only callbacks whose output contains this text, e.g. graph')
+    args = parser.parse_args()
+
+    base_url = args.url if args.url.endswith('/') else args.url + '/'
+    callbacks = discover_callbacks(base_url, requests.Session(), args.callback)
+    if not callbacks:
+        parser.error('no server-side callbacks found')
+
+    if args.warmup:
+        run_load(base_url, callbacks, args.concurrency, args.warmup)
+    results, elapsed = run_load(base_url, callbacks, args.concurrency, args.duration)
+    print_table(results, elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+A stand-in XNAT REST server serving synthetic projects.
+
+Only the endpoints the dashboard_utils loaders use are implemented: project
+documents, subject and experiment listings, subject documents, scan and file
+listings, and DICOM downloads, which honour byte ranges. Everything is
+generated deterministically from the project's sizes, so runs with the same
+settings see the same data.
+
+Run ``python -m benchmarks.mock_xnat --port 8080`` to serve a project by hand.
+"""
+import argparse
+import functools
+import io
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import CTImageStorage, ExplicitVRLittleEndian, generate_uid
+
+DEMOGRAPHICS_XPATH = 'xnat:subjectdata/demographics[@xsi:type=xnat:demographicdata]'
+
+GENDERS = ['male', 'female', '', 'female', 'male']
+
+
+class SyntheticProject:
+    """
+    Sizes and generated contents of one mock project.
+
+    Set ``listing_demographics=False`` to mimic servers that ignore demographic
+    columns in the subject listing, which forces the per-subject fallback.
+    """
+
+    def __init__(self, project_id, subjects=500, experiments_per_subject=2, slices=64, image_size=256,
+                 listing_demographics=True, scans=1):
+        self.project_id = project_id
+        self.subjects = subjects
+        self.experiments_per_subject = experiments_per_subject
+        self.scans = scans
+        self.slices = slices
+        self.image_size = image_size
+        self.listing_demographics = listing_demographics
+
+    def subject_id(self, index):
+        return f'{self.project_id}_S{index:05d}'
+
+    def subject_label(self, index):
+        return f'sub-{index:05d}'
+
+    def demographics(self, index):
+        gender = GENDERS[index % len(GENDERS)]
+        age = '' if index % 11 == 0 else str(18 + (index * 37) % 70)
+        return gender, age
+
+    def session_label(self, index, visit):
+        return f'{self.subject_label(index)}_MR{visit + 1}'
+
+    def sessions(self):
+        for index in range(self.subjects):
+            for visit in range(self.experiments_per_subject):
+                yield index, visit
+
+    def session_labels(self):
+        return [self.session_label(index, visit) for index, visit in self.sessions()]
+
+    def slice_name(self, number):
+        return f'1-{number:03d}.dcm'
+
+
+@functools.lru_cache(maxsize=256)
+def synthetic_dicom(image_size, number, slices):
+    """Encode an uncompressed CT slice whose pixels vary with the slice number."""
+    y, x = np.mgrid[0:image_size, 0:image_size]
+    radius = np.hypot(x - image_size / 2, y - image_size / 2)
+    pixels = (1000 * np.cos(radius / (4 + number % 7)) + 10 * number).astype(np.int16)
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = CTImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid(entropy_srcs=[str(image_size), str(number)])
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = 'CT'
+    ds.InstanceNumber = number
+    ds.SliceLocation = float(number - slices / 2)
+    ds.ImagePositionPatient = [0.0, 0.0, float(number - slices / 2)]
+    ds.WindowCenter = 40
+    ds.WindowWidth = 400
+    ds.Rows, ds.Columns = pixels.shape
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = 'MONOCHROME2'
+    ds.BitsAllocated = 16
+    ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 1
+    ds.PixelData = pixels.tobytes()
+
+    buffer = io.BytesIO()
+    pydicom.dcmwrite(buffer, ds, enforce_file_format=True)
+    return buffer.getvalue()
+
+
+def _listing(rows):
+    return {'ResultSet': {'Result': rows, 'totalRecords': str(len(rows))}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    routes = [
+        (re.compile(r'^/data/projects/(?P<project>[^/]+)$'), 'project'),
+        (re.compile(r'^/data/projects/(?P<project>[^/]+)/subjects$'), 'subjects'),
+        (re.compile(r'^/data/projects/(?P<project>[^/]+)/subjects/(?P<subject>[^/]+)$'), 'subject'),
+        (re.compile(r'^/data/projects/(?P<project>[^/]+)/experiments$'), 'experiments'),
+        (re.compile(r'^/data/projects/(?P<project>[^/]+)/experiments/(?P<session>[^/]+)/scans$'), 'scans'),
+        (re.compile(r'^/data/projects/(?P<project>[^/]+)/experiments/(?P<session>[^/]+)/scans/(?P<scan>[^/]+)/files$'),
+         'files'),
+        (re.compile(r'^/data/projects/(?P<project>[^/]+)/experiments/(?P<session>[^/]+)/scans/(?P<scan>[^/]+)'
+                    r'/resources/DICOM/files/(?P<name>[^/]+)$'), 'file'),
+    ]
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        self.server.count_request()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        for pattern, name in self.routes:
+            match = pattern.match(url.path)
+            if match:
+                project = self.server.projects.get(match['project'])
+                if project is None:
+                    return self.send_error(404, 'Unknown project')
+                return getattr(self, f'get_{name}')(project, query, **{
+                    key: value for key, value in match.groupdict().items() if key != 'project'
+                })
+
+        self.send_error(404)
+
+    def send_body(self, body, content_type, ranged=False):
+        status = 200
+        byte_range = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', '')) if ranged else None
+        if byte_range:
+            start = int(byte_range[1])
+            stop = min(int(byte_range[2] or len(body) - 1), len(body) - 1)
+            status, total, body = 206, len(body), body[start:stop + 1]
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{stop}/{total}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data):
+        self.send_body(json.dumps(data).encode(), 'application/json')
+
+    def subject_index(self, project, label):
+        match = re.fullmatch(r'(?:.*_S|sub-)(\d+)', label)
+        index = int(match[1]) if match else -1
+        if not 0 <= index < project.subjects:
+            self.send_error(404, 'Unknown subject')
+            return None
+        return index
+
+    def session_index(self, project, label):
+        match = re.fullmatch(r'sub-(\d+)_MR(\d+)', label)
+        if not match or not 0 <= int(match[1]) < project.subjects \
+                or not 0 < int(match[2]) <= project.experiments_per_subject:
+            self.send_error(404, 'Unknown session')
+            return None
+        return int(match[1]), int(match[2]) - 1
+
+    def get_project(self, project, query):
+        self.send_json({'items': [{
+            'data_fields': {'ID': project.project_id, 'name': project.project_id,
+                            'description': f'Synthetic project with {project.subjects} subjects'},
+            'meta': {'last_modified': '2024-01-01 00:00:00.0'},
+        }]})
+
+    def get_subjects(self, project, query):
+        columns = query.get('columns', '')
+        demographics = project.listing_demographics and 'demographics' in columns
+
+        rows = []
+        for index in range(project.subjects):
+            row = {'ID': project.subject_id(index), 'URI': f'/data/subjects/{project.subject_id(index)}'}
+            if columns != 'ID':
+                row['label'] = project.subject_label(index)
+                row['project'] = project.project_id
+            if demographics:
+                gender, age = project.demographics(index)
+                row[f'{DEMOGRAPHICS_XPATH}/gender'] = gender
+                row[f'{DEMOGRAPHICS_XPATH}/age'] = age
+            rows.append(row)
+        self.send_json(_listing(rows))
+
+    def get_subject(self, project, query, subject):
+        index = self.subject_index(project, subject)
+        if index is None:
+            return
+        gender, age = project.demographics(index)
+        self.send_json({'items': [{
+            'data_fields': {'ID': project.subject_id(index), 'label': project.subject_label(index)},
+            'children': [{'field': 'demographics', 'items': [{'data_fields': {'gender': gender, 'age': age}}]}],
+        }]})
+
+    def get_experiments(self, project, query):
+        rows = []
+        for index, visit in project.sessions():
+            row = {'ID': f'{project.project_id}_E{index:05d}_{visit + 1}'}
+            if query.get('columns') != 'ID':
+                row.update({
+                    'label': project.session_label(index, visit),
+                    'subject_label': project.subject_label(index),
+                    'date': f'2020-{visit % 12 + 1:02d}-{index % 28 + 1:02d}',
+                    'xsiType': 'xnat:mrSessionData',
+                })
+            rows.append(row)
+        self.send_json(_listing(rows))
+
+    def get_scans(self, project, query, session):
+        if self.session_index(project, session) is not None:
+            self.send_json(_listing([
+                {'ID': str(scan), 'type': f'T{scan}', 'series_description': f'Synthetic series {scan}'}
+                for scan in range(1, project.scans + 1)
+            ]))
+
+    def valid_scan(self, project, session, scan):
+        if self.session_index(project, session) is None:
+            return False
+        if not scan.isdigit() or not 0 < int(scan) <= project.scans:
+            self.send_error(404, 'Unknown scan')
+            return False
+        return True
+
+    def get_files(self, project, query, session, scan):
+        if not self.valid_scan(project, session, scan):
+            return
+        size = len(synthetic_dicom(project.image_size, 1, project.slices))
+        base = f'/data/projects/{project.project_id}/experiments/{session}/scans/{scan}/resources/DICOM/files'
+        self.send_json(_listing([
+            {'Name': project.slice_name(number), 'URI': f'{base}/{project.slice_name(number)}', 'Size': str(size)}
+            for number in range(1, project.slices + 1)
+        ]))
+
+    def get_file(self, project, query, session, scan, name):
+        match = re.fullmatch(r'1-(\d+)\.dcm', name)
+        if not self.valid_scan(project, session, scan):
+            return
+        if not match or not 0 < int(match[1]) <= project.slices:
+            return self.send_error(404, 'Unknown file')
+        self.send_body(synthetic_dicom(project.image_size, int(match[1]), project.slices), 'application/dicom',
+                       ranged=True)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockXNATServer(ThreadingHTTPServer):
+    """
+    Serve synthetic projects on a background thread.
+
+    ``latency`` seconds are added to every request to mimic a remote XNAT.
+    Use as a context manager; ``url`` is the base URL to connect to.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, projects, latency=0.0, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+        self.projects = {project.project_id: project for project in projects}
+        self.latency = latency
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count_request(self):
+        with self._count_lock:
+            self.request_count += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='mock-xnat', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic project from a mock XNAT REST server.')
+    parser.add_argument('-p', '--port', type=int, default=8080, help='Port to listen on (default: 8080)')
+    parser.add_argument('--project', default='BENCH', help='Project ID (default: BENCH)')
+    parser.add_argument('--subjects', type=int, default=500, help='Number of subjects (default: 500)')
+    parser.add_argument('--experiments', type=int, default=2, help='Experiments per subject (default: 2)')
+    parser.add_argument('--scans', type=int, default=1, help='Scans per experiment (default: 1)')
+    parser.add_argument('--slices', type=int, default=64, help='DICOM slices per scan (default: 64)')
+    parser.add_argument('--image-size', type=int, default=256, help='Slice width and height (default: 256)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request (default: 0)')
+    args = parser.parse_args()
+
+    project = SyntheticProject(args.project, args.subjects, args.experiments, args.slices, args.image_size,
+                               scans=args.scans)
+    server = MockXNATServer([project], latency=args.latency, host='0.0.0.0', port=args.port)
+    print(f'Serving project {args.project} on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Time the dashboards' XNAT data paths against the mock XNAT server.
+
+Each case runs in a fresh process with its own cache directory, so its peak
+RSS and cold/warm behaviour do not depend on the cases before it. Results can
+be saved with ``--json`` and compared with a previous run with ``--compare``::
+
+    python -m benchmarks.run --subjects 2000 --latency 0.02 --json before.json
+    python -m benchmarks.run --subjects 2000 --latency 0.02 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from dashboard_utils.demographics import load_cached_subject_demographics, load_subject_demographics
+from dashboard_utils.metrics import instrument_connection, registry
+from dashboard_utils.montage import fetch_montage_images, render_session_montage
+from dashboard_utils.render import render_montage
+from dashboard_utils.series import index_scan
+from dashboard_utils.sessions import load_experiments
+from dashboard_utils.summary import request_project_summary
+
+from .client import RestConnection
+from .mock_xnat import MockXNATServer, SyntheticProject
+
+PROJECT_ID = 'BENCH'
+# Same project on a server that ignores demographic listing columns
+LEGACY_PROJECT_ID = 'BENCH_LEGACY'
+
+CASES = {}
+
+
+def case(name, warmup=0, sessions=False):
+    """
+    Register a benchmark case.
+
+    ``warmup`` untimed calls run first; with ``sessions=True`` every timed call
+    gets a different session label, so montage caches are cold.
+    """
+    def register(func):
+        func.warmup = warmup
+        func.sessions = sessions
+        CASES[name] = func
+        return func
+    return register
+
+
+@case('subjects-listing')
+def subjects_listing(connection, config, session):
+    return load_subject_demographics(connection, PROJECT_ID)
+
+
+@case('subjects-per-subject')
+def subjects_per_subject(connection, config, session):
+    return load_subject_demographics(connection, LEGACY_PROJECT_ID)
+
+
+@case('subjects-snapshot', warmup=1)
+def subjects_snapshot(connection, config, session):
+    return load_cached_subject_demographics(connection, config['url'], PROJECT_ID)
+
+
+@case('sessions')
+def session_list(connection, config, session):
+    return load_experiments(connection, PROJECT_ID)
+
+
+@case('project-summary')
+def project_summary(connection, config, session):
+    return request_project_summary(connection, PROJECT_ID).result()
+
+
+@case('series-index', sessions=True)
+def series_index(connection, config, session):
+    return index_scan(connection, PROJECT_ID, session, '1')
+
+
+@case('montage-fetch-cold', sessions=True)
+def montage_fetch_cold(connection, config, session):
+    return fetch_montage_images(connection, config['url'], PROJECT_ID, session, config['rows'], config['cols'])
+
+
+@case('montage-fetch-warm', warmup=1)
+def montage_fetch_warm(connection, config, session):
+    return fetch_montage_images(connection, config['url'], PROJECT_ID, session, config['rows'], config['cols'])
+
+
+@case('montage-render', warmup=1)
+def montage_render(connection, config, session):
+    images = fetch_montage_images(connection, config['url'], PROJECT_ID, session, config['rows'], config['cols'])
+    return render_montage(images, config['rows'], config['cols'])
+
+
+@case('montage-session-cold', sessions=True)
+def montage_session_cold(connection, config, session):
+    return render_session_montage(connection, config['url'], PROJECT_ID, session, config['rows'], config['cols'])
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def run_case(name, config):
+    """Run one case in the current (fresh) process and return its timings."""
+    # dashboard_utils reads these whenever it builds its default stores and engines
+    os.environ['DASHBOARD_CACHE_DIR'] = os.path.join(config['cache_dir'], name)
+    os.environ['DASHBOARD_FETCH_WORKERS'] = str(config['workers'])
+    os.environ.pop('DASHBOARD_GATEWAY_URL', None)
+
+    func = CASES[name]
+    connection = instrument_connection(RestConnection(config['url']), 'benchmark')
+    labels = config['sessions'][:config['repeat'] + func.warmup]
+
+    for _ in range(func.warmup):
+        func(connection, config, labels[0])
+    registry.reset()
+
+    durations = []
+    for i in range(config['repeat']):
+        session = labels[i % len(labels)] if func.sessions else labels[0]
+        started = time.perf_counter()
+        func(connection, config, session)
+        durations.append(time.perf_counter() - started)
+
+    return {
+        'durations': durations,
+        'requests': sum(registry.requests.values()),
+        'bytes': sum(registry.bytes.values()),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def summarize(name, result):
+    durations = np.array(result['durations'])
+    return {
+        'case': name,
+        'n': len(durations),
+        'p50_ms': float(np.percentile(durations, 50) * 1000),
+        'p95_ms': float(np.percentile(durations, 95) * 1000),
+        'mean_ms': float(durations.mean() * 1000),
+        'ops_per_s': float(len(durations) / durations.sum()),
+        'requests_per_op': result['requests'] / len(durations),
+        'mb_per_op': result['bytes'] / len(durations) / 2 ** 20,
+        'peak_rss_mb': result['peak_rss_mb'],
+    }
+
+
+def print_table(rows, baseline=None):
+    baseline = {row['case']: row for row in (baseline or [])}
+    header = f"{'case':<22}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'ops/s':>9}{'req/op':>9}{'MB/op':>8}{'RSS MB':>9}"
+    if baseline:
+        header += f"{'p50 vs base':>13}"
+    print(header)
+
+    for row in rows:
+        line = (f"{row['case']:<22}{row['n']:>5}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+                f"{row['ops_per_s']:>9.1f}{row['requests_per_op']:>9.1f}{row['mb_per_op']:>8.2f}"
+                f"{row['peak_rss_mb']:>9.0f}")
+        base = baseline.get(row['case'])
+        if base:
+            line += f"{row['p50_ms'] / base['p50_ms']:>12.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the dashboards\' XNAT data paths on a mock XNAT server.')
+    parser.add_argument('cases', nargs='*', metavar='case', help=f'Cases to run (default: all of {", ".join(CASES)})')
+    parser.add_argument('--subjects', type=int, default=1000, help='Subjects in the project (default: 1000)')
+    parser.add_argument('--experiments', type=int, default=2, help='Experiments per subject (default: 2)')
+    parser.add_argument('--slices', type=int, default=64, help='DICOM slices per scan (default: 64)')
+    parser.add_argument('--image-size', type=int, default=256, help='Slice width and height (default: 256)')
+    parser.add_argument('--latency', type=float, default=0.01, help='Seconds added to every request (default: 0.01)')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed calls per case (default: 10)')
+    parser.add_argument('--rows', type=int, default=3, help='Montage rows (default: 3)')
+    parser.add_argument('--cols', type=int, default=3, help='Montage columns (default: 3)')
+    parser.add_argument('--workers', type=int, default=16, help='FetchEngine workers (default: 16)')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare p50 latencies with')
+    args = parser.parse_args()
+
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        parser.error(f'unknown case(s): {", ".join(sorted(unknown))}')
+
+    projects = [
+        SyntheticProject(project_id, args.subjects, args.experiments, args.slices, args.image_size,
+                         listing_demographics=project_id == PROJECT_ID)
+        for project_id in (PROJECT_ID, LEGACY_PROJECT_ID)
+    ]
+
+    with MockXNATServer(projects, latency=args.latency) as server, tempfile.TemporaryDirectory() as cache_dir:
+        config = {
+            'url': server.url,
+            'cache_dir': cache_dir,
+            'sessions': projects[0].session_labels(),
+            'repeat': args.repeat,
+            'rows': args.rows,
+            'cols': args.cols,
+            'workers': args.workers,
+        }
+
+        rows = []
+        for name in args.cases or CASES:
+            # A fresh process per case keeps peak RSS and in-memory caches separate
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                rows.append(summarize(name, executor.submit(run_case, name, config).result()))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_table(rows, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'settings': {key: value for key, value in vars(args).items() if key not in ('json', 'compare')},
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': rows,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+Start-up time of every dashboard entry point.
+
+For each entry point this reports:
+
+- import: time to run the entry point's top-level imports in a fresh
+  interpreter, from ``-X importtime``, with its heaviest imports;
+- init: time to import and run the whole module, for the entry points that
+  can be run without a server or an XNAT connection (Dash and Flask apps);
+- ttfb: time from starting the entry point's server until the first byte of
+  its first page, for the entry points that can be served without XNAT.
+
+Both the lazy (default) and eager (``DASHBOARD_LAZY_IMPORTS=0``) import modes
+can be measured. Save a run with ``--json`` and check later runs against it
+with ``--compare``; ``--max-regression`` makes the run fail when an entry point
+got slower than that factor::
+
+    python -m benchmarks.startup --json startup.json
+    python -m benchmarks.startup --compare startup.json --max-regression 1.25
+
+Entry points whose dependencies or server command are not installed are
+reported as skipped.
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# serve: command with a {port} placeholder, run from the repository root; url: path of the first page
+EntryPoint = namedtuple('EntryPoint', ['path', 'init', 'serve', 'url'])
+
+ENTRY_POINTS = {
+    'dash-app': EntryPoint(
+        'dash/app.py', True,
+        [sys.executable, 'dash/serve.py', 'dash/app.py', '--workers', '1', '--bind', '127.0.0.1:{port}'], '/'),
+    'dash-basic-app': EntryPoint(
+        'dash/basic-app.py', True,
+        [sys.executable, 'dash/serve.py', 'dash/basic-app.py', '--workers', '1', '--bind', '127.0.0.1:{port}'], '/'),
+    'dash-subject-demographics': EntryPoint('dash/subject-demographics.py', True, None, None),
+    'flask-gateway': EntryPoint('flask/app.py', True, [sys.executable, 'flask/app.py', '--port', '{port}'], '/'),
+    'panel-app': EntryPoint('panel/app.py', False, ['panel', 'serve', 'panel/app.py', '--port', '{port}'], '/app'),
+    'panel-project-overview': EntryPoint('panel/project-overview.py', False, None, None),
+    'panel-image-session-montage': EntryPoint('panel/image-session-montage.ipynb', False, None, None),
+    'streamlit-subject-demographics': EntryPoint('streamlit/subject-demographics.py', False, None, None),
+    'voila-project-overview': EntryPoint('voila/project-overview.ipynb', False, None, None),
+}
+
+MARKER = '-- entry point imports --'
+
+
+def source_of(path):
+    """Python source of a script, or of a notebook's code cells without their IPython magics."""
+    with open(os.path.join(ROOT, path)) as f:
+        if not path.endswith('.ipynb'):
+            return f.read()
+        cells = [''.join(cell['source']) for cell in json.load(f)['cells'] if cell['cell_type'] == 'code']
+    return '\n'.join(line for cell in cells for line in cell.splitlines() if not line.lstrip().startswith(('%', '!')))
+
+
+def _is_lazy_import(node):
+    return (isinstance(node, ast.Assign) and isinstance(node.value, ast.Call)
+            and getattr(node.value.func, 'id', None) == 'lazy_import')
+
+
+def import_statements(path):
+    """The entry point's top-level imports, including ``x = lazy_import(...)``, in order."""
+    tree = ast.parse(source_of(path))
+    return [ast.unparse(node) for node in tree.body
+            if isinstance(node, (ast.Import, ast.ImportFrom)) or _is_lazy_import(node)]
+
+
+def _import_script(statements):
+    return '\n'.join([
+        'import json, os, sys, time',
+        f'sys.path.append({ROOT!r})',
+        f'sys.stderr.write({MARKER!r} + "\\n")',
+        'missing = []',
+        'started = time.perf_counter()',
+        'namespace = {}',
+        f'for statement in {statements!r}:',
+        '    try:',
+        '        exec(statement, namespace)',
+        '    except ModuleNotFoundError as error:',
+        '        missing.append(error.name)',
+        # The app directories (dash/, panel/, streamlit/...) import as empty namespace packages
+        # when the library of the same name is not installed
+        'missing += [name for name, module in list(sys.modules.items()) if getattr(module, "__file__", None) is None',
+        f'            and any(os.path.dirname(path) == {ROOT!r} for path in getattr(module, "__path__", []))]',
+        'print(json.dumps({"seconds": time.perf_counter() - started, "missing": missing}))',
+    ])
+
+
+def _init_script(path):
+    return '\n'.join([
+        'import json, runpy, sys, time',
+        f'sys.path.append({ROOT!r})',
+        'started = time.perf_counter()',
+        f'runpy.run_path({os.path.join(ROOT, path)!r}, run_name="__startup__")',
+        'print(json.dumps({"seconds": time.perf_counter() - started}))',
+    ])
+
+
+def parse_importtime(stderr, top=3):
+    """Top-level modules imported after the marker, heaviest first, as (name, cumulative seconds)."""
+    lines = stderr.split(MARKER, 1)[-1].splitlines()
+    modules = []
+    for line in lines:
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        # Nested imports are indented by two spaces per level
+        if len(name) - len(name.lstrip()) == 1:
+            modules.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(modules, key=lambda module: -module[1])[:top]
+
+
+def run_python(script, path, env, args=()):
+    # Run from the entry point's directory, like the dashboard servers do
+    result = subprocess.run([sys.executable, *args, '-c', script], cwd=os.path.dirname(os.path.join(ROOT, path)),
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed')
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_byte(entry, env, timeout):
+    """Seconds from starting the entry point's server until its first page starts to arrive."""
+    port = free_port()
+    command = [part.format(port=port) for part in entry.serve]
+    started = time.perf_counter()
+    # A session of its own, so the server's worker processes are stopped with it
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f'server exited with status {process.returncode}')
+            try:
+                with requests.get(f'http://127.0.0.1:{port}{entry.url}', stream=True, timeout=timeout) as response:
+                    next(response.iter_content(1), None)
+                    return time.perf_counter() - started
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        raise RuntimeError(f'no response within {timeout} s')
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+
+def measure(name, entry, lazy, repeat, timeout):
+    env = dict(os.environ, DASHBOARD_LAZY_IMPORTS='1' if lazy else '0')
+    row = {'entry': name, 'mode': 'lazy' if lazy else 'eager', 'skipped': None}
+
+    statements = import_statements(entry.path)
+    import_seconds = []
+    for _ in range(repeat):
+        result, stderr = run_python(_import_script(statements), entry.path, env, ['-X', 'importtime'])
+        import_seconds.append(result['seconds'])
+    row['import_s'] = float(np.median(import_seconds))
+    row['heaviest'] = parse_importtime(stderr)
+    row['missing'] = sorted(set(result['missing']))
+    if result['missing']:
+        row['skipped'] = f"missing {', '.join(row['missing'])}"
+        return row
+
+    try:
+        if entry.init:
+            row['init_s'] = float(np.median([run_python(_init_script(entry.path), entry.path, env)[0]['seconds']
+                                             for _ in range(repeat)]))
+        if entry.serve:
+            if not shutil.which(entry.serve[0]):
+                row['skipped'] = f'{entry.serve[0]} is not installed'
+            else:
+                row['ttfb_s'] = float(np.median([time_to_first_byte(entry, env, timeout) for _ in range(repeat)]))
+    except RuntimeError as error:
+        row['skipped'] = str(error)
+    return row
+
+
+def _seconds(row, key):
+    value = row.get(key)
+    return f'{value:>8.2f}' if value is not None else f"{'-':>8}"
+
+
+def print_table(rows, baseline=None):
+    baseline = {(row['entry'], row['mode']): row for row in (baseline or [])}
+    header = f"{'entry':<32}{'mode':<7}{'import s':>9}{'init s':>8}{'ttfb s':>8}"
+    if baseline:
+        header += f"{'vs base':>9}"
+    print(header + '  heaviest imports / notes')
+
+    for row in rows:
+        line = f"{row['entry']:<32}{row['mode']:<7} {_seconds(row, 'import_s')}{_seconds(row, 'init_s')}{_seconds(row, 'ttfb_s')}"
+        if baseline:
+            ratio = regression(row, baseline.get((row['entry'], row['mode'])))
+            line += f"{ratio:>8.2f}x" if ratio else f"{'-':>9}"
+        notes = ', '.join(f'{module} {seconds:.2f}' for module, seconds in row['heaviest'])
+        if row['skipped']:
+            notes = f"{notes}; skipped: {row['skipped']}" if notes else f"skipped: {row['skipped']}"
+        print(f'{line}  {notes}')
+
+
+def regression(row, base):
+    """Largest ratio of this run's times to the baseline's, over the times both runs measured."""
+    if not base:
+        return None
+    ratios = [row[key] / base[key] for key in ('import_s', 'init_s', 'ttfb_s')
+              if row.get(key) is not None and base.get(key)]
+    return max(ratios) if ratios else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import, initialization and first-byte time of the dashboards.')
+    parser.add_argument('entries', nargs='*', metavar='entry',
+                        help=f'Entry points to measure (default: all of {", ".join(ENTRY_POINTS)})')
+    parser.add_argument('--mode', choices=['lazy', 'eager', 'both'], default='lazy',
+                        help='Import mode to measure (default: lazy)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the median is reported (default: 3)')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for a server (default: 60)')
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare with')
+    parser.add_argument('--max-regression', type=float,
+                        help='Exit with status 1 if any time exceeds the --compare baseline by this factor')
+    args = parser.parse_args()
+
+    unknown = set(args.entries) - set(ENTRY_POINTS)
+    if unknown:
+        parser.error(f'unknown entry point(s): {", ".join(sorted(unknown))}')
+    if args.max_regression and not args.compare:
+        parser.error('--max-regression needs --compare')
+
+    modes = {'lazy': [True], 'eager': [False], 'both': [False, True]}[args.mode]
+    rows = [
+        measure(name, ENTRY_POINTS[name], lazy, args.repeat, args.timeout)
+        for name in args.entries or ENTRY_POINTS
+        for lazy in modes
+    ]
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_table(rows, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'settings': {'mode': args.mode, 'repeat': args.repeat},
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': rows,
+            }, f, indent=2)
+
+    if args.max_regression:
+        baseline = {(row['entry'], row['mode']): row for row in baseline}
+        regressed = [row['entry'] for row in rows
+                     if (regression(row, baseline.get((row['entry'], row['mode']))) or 0) > args.max_regression]
+        if regressed:
+            print(f"Slower than {args.max_regression}x the baseline: {', '.join(regressed)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
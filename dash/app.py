@@ -1,9 +1,24 @@
-from dash import Dash, html, dcc, callback, Output, Input
-import plotly.express as px
-import pandas as pd
+from dash import Dash, html, dcc, callback, ctx, no_update, Output, Input
+import functools
+import json
 import os
+import sys
 
-df = pd.read_csv('https://raw.githubusercontent.com/plotly/datasets/master/gapminder_unfiltered.csv')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dashboard_utils.datasets import load_dataset
+from dashboard_utils.downsample import downsample_indices
+from dashboard_utils.lazy import lazy_import
+
+# Loaded by the first figure, not before the page is served
+px = lazy_import('plotly.express')
+
+df = load_dataset('gapminder_unfiltered', columns=['country', 'year', 'pop'])
+
+# Row positions of every country, built once instead of scanning the whole frame per request
+country_rows = df.groupby('country', sort=False).indices
+
+# Long series are reduced to about two points per horizontal pixel before plotting
+plot_points = 1000
 
 user = os.getenv('JUPYTERHUB_USER')
 jupyterhub_base_url = os.getenv('JUPYTERHUB_SERVICE_PREFIX', f"/jupyterhub/user/{user}/")
@@ -21,11 +36,31 @@ app.layout = html.Div([
 
 @callback(
     Output('graph-content', 'figure'),
-    Input('dropdown-selection', 'value')
+    Input('dropdown-selection', 'value'),
+    Input('graph-content', 'relayoutData')
 )
-def update_graph(value):
-    dff = df[df.country==value]
-    return px.line(dff, x='year', y='pop')
+def update_graph(value, relayout_data):
+    if ctx.triggered_id != 'graph-content':
+        return country_figure(value)
+
+    # Zooming or panning re-samples the visible range at full resolution
+    relayout_data = relayout_data or {}
+    if 'xaxis.range[0]' in relayout_data:
+        return country_figure(value, (relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']))
+    if 'xaxis.autorange' in relayout_data:
+        return country_figure(value)
+    return no_update
+
+@functools.lru_cache(maxsize=256)
+def country_figure(value, x_range=None):
+    ''' Builds the figure for a country once and keeps it as plain JSON '''
+    dff = df.iloc[country_rows.get(value, [])]
+    dff = dff.iloc[downsample_indices(dff['year'].to_numpy(), dff['pop'].to_numpy(), plot_points, x_range=x_range)]
+
+    fig = px.line(dff, x='year', y='pop')
+    # Keep the user's zoom when the figure is replaced by a re-sampled one
+    fig.update_layout(uirevision=value)
+    return json.loads(fig.to_json())
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8050)
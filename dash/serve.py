@@ -0,0 +1,105 @@
+'''
+Production server for the Dash apps in this directory.
+
+    python dash/serve.py dash/app.py --workers 4 --threads 8 --bind 0.0.0.0:8050
+
+The app file is imported, and each of its callbacks runs once, in the parent
+process, so its data is loaded, its layout built and its lazy imports done
+before gunicorn forks the workers, which then share those pages
+copy-on-write. Every worker serves requests from several threads, so a slow
+callback holds one thread instead of blocking every other user.
+GET <prefix>ready answers 200 from any worker that is serving.
+'''
+import argparse
+import gc
+import importlib.util
+import os
+import sys
+import time
+
+from flask import jsonify
+from gunicorn.app.base import BaseApplication
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dashboard_utils.dash_callbacks import server_callbacks
+
+def load_app(path):
+    ''' Imports a Dash app file, e.g. dash/basic-app.py, and returns its Dash instance '''
+    path = os.path.abspath(path)
+    name = os.path.splitext(os.path.basename(path))[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Dash finds the app's assets folder through sys.modules
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module.app
+
+def add_ready_route(app):
+    ''' Readiness endpoint for the proxy or orchestrator in front of the workers '''
+    @app.server.route(f'{app.config.routes_pathname_prefix}ready')
+    def ready():
+        # Workers only start once the app is loaded and warmed, so serving means ready
+        return jsonify(status='ready', pid=os.getpid())
+
+def warm_app(app):
+    ''' Runs every callback once with the initial layout values '''
+    client = app.server.test_client()
+    prefix = app.config.routes_pathname_prefix
+
+    # Dash registers its callbacks on the first request; doing that here
+    # means no worker thread can see a half-registered callback map
+    dependencies = client.get(f'{prefix}_dash-dependencies').get_json()
+    layout = client.get(f'{prefix}_dash-layout').get_json()
+
+    # Loads what the callbacks import lazily (plotly's validators and
+    # templates) and fills their caches once, instead of in every worker
+    for callback in server_callbacks(layout, dependencies):
+        client.post(f'{prefix}_dash-update-component', json=callback.body())
+
+class DashApplication(BaseApplication):
+    ''' gunicorn application that preloads one Dash app file before forking '''
+
+    def __init__(self, path, options):
+        self.path = path
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        started = time.perf_counter()
+        app = load_app(self.path)
+        add_ready_route(app)
+        warm_app(app)
+        print(f"Loaded and warmed {self.path} in {time.perf_counter() - started:.2f} s", flush=True)
+
+        # Objects that exist before the fork are never collected again, so a
+        # collection in a worker does not touch, and so copy, the shared pages
+        gc.collect()
+        gc.freeze()
+        return app.server
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a Dash app with preloaded, forked gunicorn workers.')
+    parser.add_argument('app', help='Path of the Dash app file, e.g. dash/app.py')
+    parser.add_argument('-b', '--bind', default='0.0.0.0:8050', help='Address to listen on (default: 0.0.0.0:8050)')
+    parser.add_argument('-w', '--workers', type=int, default=int(os.getenv('DASHBOARD_WORKERS', os.cpu_count() or 1)),
+                        help='Worker processes (default: DASHBOARD_WORKERS or the number of CPUs)')
+    parser.add_argument('-t', '--threads', type=int, default=int(os.getenv('DASHBOARD_THREADS', 8)),
+                        help='Threads per worker (default: DASHBOARD_THREADS or 8)')
+    parser.add_argument('--timeout', type=int, default=120, help='Seconds before a stuck worker is restarted (default: 120)')
+    args = parser.parse_args()
+
+    DashApplication(args.app, {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': args.timeout,
+    }).run()
+
+if __name__ == '__main__':
+    main()
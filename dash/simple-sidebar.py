@@ -91,4 +91,4 @@ def render_page_content(pathname):
 
 
 if __name__ == "__main__":
-    app.run_server(port=8050, host='0.0.0.0')
\ No newline at end of file
+    app.run(port=8050, host='0.0.0.0')
\ No newline at end of file
@@ -1,12 +1,20 @@
 # Import packages
-from dash import Dash, html, dash_table, dcc, callback, Output, Input
-import pandas as pd
-import plotly.express as px
+from dash import Dash, html, dcc, callback, Output, Input
 import dash_bootstrap_components as dbc
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dashboard_utils.dash_tables import ServerSideTable, server_side_table
+from dashboard_utils.datasets import load_dataset
+from dashboard_utils.lazy import lazy_import
+
+# Loaded by the first figure, not before the page is served
+px = lazy_import('plotly.express')
 
 # Incorporate data
-df = pd.read_csv('https://raw.githubusercontent.com/plotly/datasets/master/gapminder2007.csv')
+df = load_dataset('gapminder2007')
+table = ServerSideTable(df)
 
 # Dash setup
 user = os.getenv('JUPYTERHUB_USER')
@@ -35,7 +43,8 @@ app.layout = dbc.Container([
 
     dbc.Row([
         dbc.Col([
-            dash_table.DataTable(data=df.to_dict('records'), page_size=12, style_table={'overflowX': 'auto'})
+            # Only the visible page is sent to the browser; paging, sorting and filtering run on the server
+            server_side_table('data-table', table, page_size=12, style_table={'overflowX': 'auto'})
         ], width=6),
 
         dbc.Col([
@@ -56,4 +65,4 @@ def update_graph(col_chosen):
 
 # Run the app
 if __name__ == "__main__":
-    app.run_server(port=8050, host='0.0.0.0', debug=True)
+    app.run(port=8050, host='0.0.0.0', debug=True)
@@ -0,0 +1,7 @@
+"""
+Shared data access helpers for the dashboard examples.
+
+The Streamlit, Panel, Dash, Flask and Voila apps in this repository are served
+straight from their own directories, so each entry point appends the repository
+root to ``sys.path`` before importing from this package.
+"""
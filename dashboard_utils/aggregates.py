@@ -0,0 +1,89 @@
+"""
+Cohort summaries computed next to the data instead of in the browser.
+
+Charts receive bin edges and counts (a few hundred bytes) rather than every
+subject row. Summaries are additive: subjects loaded later, e.g. in batches or
+after a project grows, are folded in with ``add`` without recounting the rest.
+"""
+import numpy as np
+import pandas as pd
+
+# Fixed 5-year bins so histograms built from different batches can be added together
+DEFAULT_AGE_EDGES = np.arange(0, 125, 5, dtype=np.float64)
+
+
+class AgeHistogram:
+    """Counts of ages per bin; ages outside the edges go into the first or last bin."""
+
+    def __init__(self, edges=DEFAULT_AGE_EDGES):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.missing = 0
+
+    def add(self, ages):
+        ages = pd.to_numeric(pd.Series(ages), errors='coerce').to_numpy(dtype=np.float64)
+        known = ages[~np.isnan(ages)]
+        self.missing += len(ages) - len(known)
+
+        clipped = np.clip(known, self.edges[0], self.edges[-1])
+        self.counts += np.histogram(clipped, bins=self.edges)[0]
+        return self
+
+    def trimmed(self):
+        """Edges and counts without the empty bins at either end."""
+        filled = np.flatnonzero(self.counts)
+        if not len(filled):
+            return self.edges[:1], self.counts[:0]
+        first, last = filled[0], filled[-1] + 1
+        return self.edges[first:last + 1], self.counts[first:last]
+
+    def to_dict(self):
+        edges, counts = self.trimmed()
+        return {'edges': edges.tolist(), 'counts': counts.tolist(), 'missing': self.missing}
+
+
+class CategoryCounts:
+    """Counts per category label, most frequent first."""
+
+    def __init__(self):
+        self.counts = {}
+        self.missing = 0
+
+    def add(self, values):
+        values = pd.Series(values)
+        self.missing += int(values.isna().sum())
+        for label, count in values.value_counts().items():
+            if count:
+                self.counts[label] = self.counts.get(label, 0) + int(count)
+        return self
+
+    def labels_and_counts(self):
+        ordered = sorted(self.counts.items(), key=lambda item: (-item[1], str(item[0])))
+        return [label for label, _ in ordered], [count for _, count in ordered]
+
+    def to_dict(self):
+        labels, counts = self.labels_and_counts()
+        return {'labels': labels, 'counts': counts, 'missing': self.missing}
+
+
+class CohortSummary:
+    """Subject count, age histogram and gender counts of a subject table."""
+
+    def __init__(self, age_edges=DEFAULT_AGE_EDGES):
+        self.subjects = 0
+        self.age = AgeHistogram(age_edges)
+        self.gender = CategoryCounts()
+
+    @classmethod
+    def from_frame(cls, df, age_edges=DEFAULT_AGE_EDGES):
+        return cls(age_edges).add(df)
+
+    def add(self, df):
+        """Fold more subject rows (``age`` and ``gender`` columns) into the summary."""
+        self.subjects += len(df)
+        self.age.add(df['age'])
+        self.gender.add(df['gender'])
+        return self
+
+    def to_dict(self):
+        return {'subjects': self.subjects, 'age': self.age.to_dict(), 'gender': self.gender.to_dict()}
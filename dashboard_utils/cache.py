@@ -0,0 +1,141 @@
+"""
+In-process caches for results that are expensive to produce and cheap to keep.
+
+ByteLRUCache is bounded by the total size of its values and holds e.g.
+rendered montage images. Concurrent misses for the same key are coalesced, so
+only one caller computes a value while the others wait for it. TTLCache holds
+small listings that XNAT may change, such as the scans of a session, for a
+limited time.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def _sizeof(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    return getattr(value, 'nbytes', None) or sys.getsizeof(value)
+
+
+class ByteLRUCache:
+    """Thread-safe LRU mapping that evicts least recently used entries once ``max_bytes`` is exceeded."""
+
+    def __init__(self, max_bytes, sizeof=_sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_create(self, key, create):
+        """Return the cached value for ``key``, calling ``create()`` once on a miss."""
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+
+                pending = self._in_flight.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._in_flight[key] = threading.Event()
+                    break
+
+            # Someone else is already creating this value; wait and look again
+            pending.wait()
+
+        try:
+            value = create()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            pending.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire after a given age, holding at most ``max_entries``."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_create(self, key, create, ttl):
+        """Return the value for ``key`` if it is younger than ``ttl`` seconds, otherwise store and return ``create()``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < ttl:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        value = create()
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,94 @@
+"""
+Callback requests for a Dash app, built from its serialized layout and callback list.
+
+``dash/serve.py`` runs every callback once with the initial layout values
+before forking its workers, and ``benchmarks/load.py`` posts the same requests
+under load, cycling Dropdown and RadioItems inputs through their options.
+"""
+import itertools
+import threading
+
+
+def walk_components(node):
+    """Yield every component of a serialized Dash layout."""
+    if isinstance(node, list):
+        for child in node:
+            yield from walk_components(child)
+    elif isinstance(node, dict) and 'props' in node:
+        yield node
+        for value in node['props'].values():
+            yield from walk_components(value)
+
+
+def layout_components(layout):
+    """Components of a serialized layout by their (string) id."""
+    return {
+        component['props']['id']: component
+        for component in walk_components(layout)
+        if isinstance(component['props'].get('id'), str)
+    }
+
+
+def parse_outputs(output):
+    """``id.prop`` or ``..id1.prop1...id2.prop2..`` as the ``outputs`` field of a callback request."""
+    if output.startswith('..'):
+        return [parse_outputs(part) for part in output[2:-2].split('...')]
+    component_id, prop = output.rsplit('.', 1)
+    return {'id': component_id, 'property': prop}
+
+
+def _input_values(props, prop):
+    """The input's value in the layout first, then the other values it can be switched to."""
+    current = props.get(prop)
+    if prop != 'value':
+        return [current]
+    options = [option['value'] if isinstance(option, dict) else option for option in props.get('options') or []]
+    return [current] + [value for value in options if value != current]
+
+
+class CallbackRequests:
+    """Request bodies for one server-side callback; the first uses the layout's initial values."""
+
+    def __init__(self, dependency, components):
+        self.output = dependency['output']
+        self.outputs = parse_outputs(self.output)
+        self.inputs = dependency['inputs']
+        self.state = dependency.get('state', [])
+        self._components = components
+        self._values = zip(*(
+            itertools.cycle(_input_values(components[item['id']]['props'], item['property']))
+            for item in self.inputs
+        ))
+        self._lock = threading.Lock()
+
+    def body(self):
+        with self._lock:
+            values = next(self._values)
+        return {
+            'output': self.output,
+            'outputs': self.outputs,
+            'inputs': [dict(item, value=value) for item, value in zip(self.inputs, values)],
+            'state': [dict(item, value=self._components[item['id']]['props'].get(item['property']))
+                      for item in self.state],
+            'changedPropIds': [f"{self.inputs[0]['id']}.{self.inputs[0]['property']}"],
+        }
+
+
+def server_callbacks(layout, dependencies, match=None):
+    """
+    Server-side callbacks whose inputs and state are all in the initial layout.
+
+    ``match`` keeps only the callbacks whose output contains it.
+    """
+    components = layout_components(layout)
+
+    callbacks = []
+    for dependency in dependencies:
+        if dependency.get('clientside_function') or not dependency['inputs']:
+            continue
+        if any(item['id'] not in components for item in dependency['inputs'] + dependency.get('state', [])):
+            continue
+        if match and match not in dependency['output']:
+            continue
+        callbacks.append(CallbackRequests(dependency, components))
+    return callbacks
@@ -0,0 +1,168 @@
+"""
+Server-side paging, sorting and filtering for Dash DataTables.
+
+Passing ``df.to_dict('records')`` to a DataTable serializes every row into the
+page. A ServerSideTable keeps the frame on the server and answers the table's
+``page_current``/``page_size``/``sort_by``/``filter_query`` with just the rows
+of the visible page. Sort orders are computed once per column and filtered
+row positions are remembered per query, so flipping pages costs the same for
+100 rows as for 100k.
+"""
+import functools
+import math
+
+import numpy as np
+from dash import Input, Output, callback, dash_table
+
+# Same operator table as the Dash "backend filtering" documentation
+FILTER_OPERATORS = [
+    ['ge ', '>='],
+    ['le ', '<='],
+    ['lt ', '<'],
+    ['gt ', '>'],
+    ['ne ', '!='],
+    ['eq ', '='],
+    ['contains '],
+    ['datestartswith '],
+]
+
+
+def split_filter_part(filter_part):
+    """Split one ``{column} op value`` clause of a filter_query into (column, operator, value)."""
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                v0 = value_part[:1]
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                return name, operator_type[0].strip(), value
+
+    return None, None, None
+
+
+class ServerSideTable:
+    """A frame served to a DataTable one page at a time."""
+
+    def __init__(self, df, cache_size=32):
+        self.df = df.reset_index(drop=True)
+        self._sort_orders = {}
+        self._positions = functools.lru_cache(maxsize=cache_size)(self._compute_positions)
+
+    @property
+    def columns(self):
+        return [{'name': column, 'id': column} for column in self.df.columns]
+
+    def _sort_order(self, column, ascending):
+        """Row positions of the whole frame sorted by one column, computed once."""
+        key = (column, ascending)
+        if key not in self._sort_orders:
+            order = self.df[column].sort_values(ascending=ascending, kind='stable', na_position='last').index
+            self._sort_orders[key] = order.to_numpy()
+        return self._sort_orders[key]
+
+    def _filter_mask(self, filter_query):
+        mask = np.ones(len(self.df), dtype=bool)
+
+        for part in filter_query.split(' && '):
+            column, operator, value = split_filter_part(part)
+            if column not in self.df.columns:
+                continue
+            series = self.df[column]
+
+            if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+                if isinstance(value, float) and series.dtype.kind not in 'iuf':
+                    value = str(value).removesuffix('.0')
+                clause = getattr(series, operator)(value)
+            elif operator == 'contains':
+                clause = series.astype(str).str.contains(str(value), regex=False)
+            elif operator == 'datestartswith':
+                clause = series.astype(str).str.startswith(str(value))
+            else:
+                continue
+
+            mask &= clause.fillna(False).to_numpy(dtype=bool)
+
+        return mask
+
+    def _compute_positions(self, filter_query, sort_by):
+        """Row positions matching ``filter_query`` in ``sort_by`` order, or None for the frame as is."""
+        if not filter_query and not sort_by:
+            return None
+
+        if len(sort_by) == 1:
+            column, direction = sort_by[0]
+            order = self._sort_order(column, direction == 'asc')
+        elif sort_by:
+            order = self.df.sort_values(
+                [column for column, _ in sort_by],
+                ascending=[direction == 'asc' for _, direction in sort_by],
+                kind='stable',
+            ).index.to_numpy()
+        else:
+            order = np.arange(len(self.df))
+
+        if filter_query:
+            order = order[self._filter_mask(filter_query)[order]]
+
+        return order
+
+    def page(self, page_current, page_size, sort_by=None, filter_query=''):
+        """Return ``(records, page_count)`` for one page of the sorted, filtered frame."""
+        page_current = page_current or 0
+        sort_key = tuple((item['column_id'], item['direction']) for item in sort_by or [])
+        positions = self._positions(filter_query or '', sort_key)
+
+        start = page_current * page_size
+        stop = start + page_size
+        if positions is None:
+            rows, total = self.df.iloc[start:stop], len(self.df)
+        else:
+            rows, total = self.df.iloc[positions[start:stop]], len(positions)
+
+        return rows.to_dict('records'), max(1, math.ceil(total / page_size))
+
+
+def server_side_table(table_id, table, page_size=12, **kwargs):
+    """
+    Build a DataTable that pages, sorts and filters on the server and register its callback.
+
+    Extra keyword arguments are passed on to ``dash_table.DataTable``.
+    """
+    data, page_count = table.page(0, page_size)
+
+    @callback(
+        Output(table_id, 'data'),
+        Output(table_id, 'page_count'),
+        Input(table_id, 'page_current'),
+        Input(table_id, 'page_size'),
+        Input(table_id, 'sort_by'),
+        Input(table_id, 'filter_query'),
+    )
+    def update_table(page_current, page_size, sort_by, filter_query):
+        return table.page(page_current, page_size, sort_by, filter_query)
+
+    return dash_table.DataTable(
+        id=table_id,
+        columns=table.columns,
+        data=data,
+        page_current=0,
+        page_size=page_size,
+        page_count=page_count,
+        page_action='custom',
+        sort_action='custom',
+        sort_mode='single',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
+        **kwargs,
+    )
@@ -0,0 +1,113 @@
+"""
+Named example datasets backed by local columnar snapshots.
+
+The demo apps used to ``pd.read_csv`` a raw GitHub URL at import time. Here each
+dataset name resolves to an Arrow IPC (Feather) file in ``DASHBOARD_DATA_DIR``
+(``data/`` at the repository root by default) that is memory-mapped on first
+use and read with only the requested columns.
+
+To prepare an air-gapped deployment, fetch the snapshots on a connected
+machine and copy the data directory across::
+
+    python -m dashboard_utils.datasets            # every registered dataset
+    python -m dashboard_utils.datasets occupancy  # just one
+
+Without a snapshot the CSV is downloaded once and written as one, unless
+``DASHBOARD_OFFLINE`` is set, in which case a missing snapshot is an error.
+"""
+import argparse
+import functools
+import os
+import tempfile
+from collections import namedtuple
+
+import pandas as pd
+import pyarrow.feather as feather
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+Dataset = namedtuple('Dataset', ['url', 'index', 'parse_dates'])
+
+DATASETS = {}
+
+
+def register_dataset(name, url, index=None, parse_dates=None):
+    """Make a CSV available under ``name``; ``index`` is restored as the frame index on load."""
+    DATASETS[name] = Dataset(url, index, parse_dates)
+
+
+register_dataset('gapminder_unfiltered', 'https://raw.githubusercontent.com/plotly/datasets/master/gapminder_unfiltered.csv')
+register_dataset('gapminder2007', 'https://raw.githubusercontent.com/plotly/datasets/master/gapminder2007.csv')
+register_dataset('occupancy', 'https://raw.githubusercontent.com/holoviz/panel/main/examples/assets/occupancy.csv',
+                 index='date', parse_dates=['date'])
+
+
+def data_dir():
+    return os.path.abspath(os.getenv('DASHBOARD_DATA_DIR', DEFAULT_DATA_DIR))
+
+
+def snapshot_path(name):
+    return os.path.join(data_dir(), f'{name}.feather')
+
+
+def _dataset(name):
+    try:
+        return DATASETS[name]
+    except KeyError:
+        raise KeyError(f'Unknown dataset {name!r}, expected one of {sorted(DATASETS)}') from None
+
+
+def fetch_dataset(name):
+    """Download a dataset's CSV and store it as a local snapshot."""
+    dataset = _dataset(name)
+    df = pd.read_csv(dataset.url, parse_dates=dataset.parse_dates)
+
+    path = snapshot_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        feather.write_feather(df, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def _load(name, columns):
+    dataset = _dataset(name)
+    path = snapshot_path(name)
+
+    if not os.path.exists(path):
+        if os.getenv('DASHBOARD_OFFLINE'):
+            raise FileNotFoundError(f'No local snapshot for dataset {name!r} at {path}')
+        fetch_dataset(name)
+
+    if columns is not None and dataset.index and dataset.index not in columns:
+        columns = (dataset.index,) + columns
+
+    df = feather.read_table(path, columns=list(columns) if columns else None, memory_map=True).to_pandas()
+    if dataset.index:
+        df = df.set_index(dataset.index)
+    return df
+
+
+def load_dataset(name, columns=None):
+    """Return a registered dataset, reading it from its local snapshot the first time it is asked for."""
+    return _load(name, tuple(columns) if columns is not None else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Download the example datasets as local snapshots.')
+    parser.add_argument('names', nargs='*', help=f'datasets to fetch (default: all of {", ".join(DATASETS)})')
+    args = parser.parse_args()
+
+    for name in args.names or DATASETS:
+        print(f'{name}: {fetch_dataset(name)}')
+
+
+if __name__ == '__main__':
+    main()
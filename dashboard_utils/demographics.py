@@ -0,0 +1,180 @@
+"""
+Subject demographics for a whole XNAT project.
+
+Instead of walking ``project.subjects`` and touching ``subject.demographics``
+once per subject (one REST round trip each), the loader asks XNAT for the
+id/gender/age columns of every subject in a single listing request.
+"""
+import itertools
+
+import pandas as pd
+
+from .aggregates import CohortSummary
+from .fetch import default_engine, widen_connection_pool
+from .gateway import default_gateway
+from .shared import default_shared_store
+from .snapshot import default_store, frame_batches, project_fingerprint
+
+SUBJECT_COLUMNS = ['id', 'gender', 'age']
+
+# Rows per batch when the table is streamed to a page
+DEFAULT_BATCH_SIZE = 1000
+
+DEMOGRAPHICS_XPATH = 'xnat:subjectData/demographics[@xsi:type=xnat:demographicData]'
+
+SUBJECT_LISTING_COLUMNS = ','.join([
+    'ID',
+    'label',
+    f'{DEMOGRAPHICS_XPATH}/gender',
+    f'{DEMOGRAPHICS_XPATH}/age',
+])
+
+
+def _lookup(row, name):
+    """Return a column from a listing row, whether XNAT keyed it by alias or by xpath."""
+    if name in row:
+        return row[name]
+
+    suffix = f'/{name}'
+    for key, value in row.items():
+        if key.lower().endswith(suffix):
+            return value
+
+    return None
+
+
+def subject_demographics_frame(records):
+    """Build the typed subject table from an iterable of (id, gender, age) records."""
+    df = pd.DataFrame.from_records(list(records), columns=SUBJECT_COLUMNS)
+
+    df['id'] = df['id'].astype('string')
+    df['gender'] = df['gender'].where(df['gender'] != '').astype('category')
+    df['age'] = pd.to_numeric(df['age'], errors='coerce').astype('float64')
+
+    return df
+
+
+def fetch_subject_record(connection, project_id, subject_id):
+    """Read one subject's (label, gender, age) from its XNAT document."""
+    result = connection.get_json(
+        f'/data/projects/{project_id}/subjects/{subject_id}',
+        query={'format': 'json'},
+    )
+    item = result['items'][0]
+
+    demographics = {}
+    for child in item.get('children', []):
+        if child.get('field') == 'demographics' and child.get('items'):
+            demographics = child['items'][0].get('data_fields', {})
+
+    return item['data_fields'].get('label'), demographics.get('gender'), demographics.get('age')
+
+
+def _subject_records(connection, project_id, engine=None):
+    """
+    Yield (label, gender, age) for every subject of a project, in listing order.
+
+    Listing rows are released as they are consumed, so the decoded JSON and
+    the typed batches built from it are not both held in full.
+    """
+    result = connection.get_json(
+        f'/data/projects/{project_id}/subjects',
+        query={'format': 'json', 'columns': SUBJECT_LISTING_COLUMNS},
+    )
+    rows = result['ResultSet']['Result']
+    del result
+
+    if rows and all(_lookup(row, 'gender') is None and _lookup(row, 'age') is None for row in rows):
+        engine = engine or default_engine()
+        widen_connection_pool(connection, engine.max_workers)
+
+        yield from engine.imap(lambda row: fetch_subject_record(connection, project_id, row['ID']), rows)
+        return
+
+    rows.reverse()
+    while rows:
+        row = rows.pop()
+        yield _lookup(row, 'label'), _lookup(row, 'gender'), _lookup(row, 'age')
+
+
+def load_subject_demographics(connection, project_id, engine=None):
+    """
+    Load id, gender and age for every subject in a project with one XNAT request.
+
+    Servers that ignore the demographic columns of the listing are handled by
+    reading the subject documents in parallel on a FetchEngine instead.
+    """
+    return subject_demographics_frame(_subject_records(connection, project_id, engine))
+
+
+def iter_subject_demographics(connection, project_id, batch_size=DEFAULT_BATCH_SIZE, engine=None):
+    """Like load_subject_demographics, but yield the table in typed batches of up to ``batch_size`` rows."""
+    records = _subject_records(connection, project_id, engine)
+    batch = list(itertools.islice(records, batch_size))
+    # An empty project still yields one (empty) batch, so consumers and snapshots see the columns
+    yield subject_demographics_frame(batch)
+
+    while len(batch) == batch_size:
+        batch = list(itertools.islice(records, batch_size))
+        if batch:
+            yield subject_demographics_frame(batch)
+
+
+def load_cached_subject_demographics(connection, xnat_host, project_id, store=None):
+    """Like load_subject_demographics, but served from the on-disk project snapshot when it is still valid."""
+    store = store or default_store()
+
+    return store.get_or_load(
+        xnat_host, project_id, 'subjects',
+        loader=lambda: load_subject_demographics(connection, project_id),
+        fingerprint=lambda: project_fingerprint(connection, project_id),
+    )
+
+
+def shared_subject_demographics(connection, xnat_host, project_id, shared=None):
+    """Compact subject table mapped from shared memory, republished from the snapshot when it expires."""
+    shared = shared or default_shared_store()
+
+    return shared.get_or_publish(
+        xnat_host, project_id, 'subjects',
+        load=lambda: load_cached_subject_demographics(connection, xnat_host, project_id),
+    )
+
+
+def get_subject_demographics(connection, xnat_host, project_id):
+    """Subject table for a dashboard: from the shared gateway if one is configured, otherwise from shared memory."""
+    gateway = default_gateway()
+    if gateway is not None:
+        return gateway.subjects(project_id)
+
+    return shared_subject_demographics(connection, xnat_host, project_id)
+
+
+def get_subject_summary(connection, xnat_host, project_id):
+    """Age histogram and gender counts as ``CohortSummary.to_dict()``: from the shared gateway if one is configured, otherwise from shared memory."""
+    gateway = default_gateway()
+    if gateway is not None:
+        return gateway.subject_summary(project_id)
+
+    return CohortSummary.from_frame(shared_subject_demographics(connection, xnat_host, project_id)).to_dict()
+
+
+def iter_cached_subject_demographics(connection, xnat_host, project_id, batch_size=DEFAULT_BATCH_SIZE, store=None):
+    """Like load_cached_subject_demographics, but yield batches; a fresh load is stored as it streams."""
+    store = store or default_store()
+
+    return store.iter_or_load(
+        xnat_host, project_id, 'subjects',
+        load_batches=lambda: iter_subject_demographics(connection, project_id, batch_size),
+        fingerprint=lambda: project_fingerprint(connection, project_id),
+        batch_size=batch_size,
+    )
+
+
+def stream_subject_demographics(connection, xnat_host, project_id, batch_size=DEFAULT_BATCH_SIZE):
+    """Subject table for a progressively rendered dashboard, in batches, from the gateway or the local snapshot."""
+    gateway = default_gateway()
+    if gateway is not None:
+        return frame_batches(gateway.subjects(project_id), batch_size)
+
+    return iter_cached_subject_demographics(connection, xnat_host, project_id, batch_size)
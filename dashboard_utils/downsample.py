@@ -0,0 +1,123 @@
+"""
+Reduce long series to roughly as many points as the plot has pixels.
+
+Two reducers are available: min/max bucketing, which keeps every bucket's
+extremes so peaks survive, and Largest-Triangle-Three-Buckets (LTTB), which
+keeps the points that best preserve the shape of the line. Points passed as
+``keep`` (e.g. highlighted outliers) are always retained. Callers pass the
+visible x range when the user zooms so the detail is re-sampled for it.
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_POINTS = 1000
+
+
+def _numeric(x):
+    """x values as float64, with datetimes as nanoseconds since the epoch."""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def minmax_indices(y, n_out):
+    """Positions of the minimum and maximum of each of ``n_out // 2`` equal-count buckets, plus both ends."""
+    n = len(y)
+    buckets = max(1, n_out // 2)
+    size = -(-n // buckets)
+
+    padded = np.pad(np.asarray(y, dtype=np.float64), (0, buckets * size - n), mode='edge').reshape(buckets, size)
+    starts = np.arange(buckets) * size
+    positions = np.concatenate(([0, n - 1], starts + padded.argmin(axis=1), starts + padded.argmax(axis=1)))
+
+    return np.unique(np.minimum(positions, n - 1))
+
+
+def lttb_indices(x, y, n_out):
+    """Positions chosen by Largest-Triangle-Three-Buckets, always including both ends."""
+    n = len(y)
+    x = _numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+
+        # Average of the next bucket is the third corner of the triangle
+        avg_x = x[stop:next_stop].mean()
+        avg_y = y[stop:next_stop].mean()
+
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (avg_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        selected[i + 1] = previous
+
+    return selected
+
+
+def downsample_indices(x, y, n_out=DEFAULT_POINTS, keep=None, x_range=None, method='minmax'):
+    """
+    Positions of the points to draw for a series sorted by ``x``.
+
+    With ``x_range`` only the visible part (plus one point either side, so the
+    line reaches the plot edges) is considered. ``keep`` positions are added to
+    the result when they fall in that part.
+    """
+    x = np.asarray(x)
+    n = len(y)
+    start, stop = 0, n
+    if x_range is not None:
+        bounds = np.asarray(x_range, dtype=x.dtype if np.issubdtype(x.dtype, np.datetime64) else np.float64)
+        numeric_x = _numeric(x)
+        low, high = _numeric(bounds)
+        start = max(0, int(np.searchsorted(numeric_x, low, side='left')) - 1)
+        stop = min(n, int(np.searchsorted(numeric_x, high, side='right')) + 1)
+
+    if stop - start <= n_out:
+        positions = np.arange(start, stop)
+    elif method == 'lttb':
+        positions = start + lttb_indices(x[start:stop], np.asarray(y)[start:stop], n_out)
+    else:
+        positions = start + minmax_indices(np.asarray(y)[start:stop], n_out)
+
+    if keep is not None and len(keep):
+        keep = np.asarray(keep, dtype=np.int64)
+        positions = np.union1d(positions, keep[(keep >= start) & (keep < stop)])
+
+    return positions
+
+
+def downsample_series(series, n_out=DEFAULT_POINTS, keep=None, x_range=None, method='minmax'):
+    """
+    Downsample a Series whose index is the x axis.
+
+    ``keep`` is a collection of index labels that must stay in the result.
+    NaN values are dropped first.
+    """
+    series = series.dropna()
+
+    keep_positions = None
+    if keep is not None:
+        keep = pd.Index(keep)
+        if series.index.is_monotonic_increasing:
+            # Binary search avoids building a hash table over a long index
+            keep_positions = series.index.searchsorted(keep)
+            keep_positions = keep_positions[keep_positions < len(series)]
+            keep_positions = keep_positions[series.index[keep_positions].isin(keep)]
+        else:
+            keep_positions = series.index.get_indexer(keep)
+            keep_positions = keep_positions[keep_positions >= 0]
+
+    x_range = None if x_range is None or None in x_range else x_range
+    positions = downsample_indices(series.index.to_numpy(), series.to_numpy(), n_out, keep=keep_positions,
+                                   x_range=x_range, method=method)
+    return series.iloc[positions]
@@ -0,0 +1,152 @@
+"""
+Bounded-concurrency fetching for metadata that has no bulk XNAT endpoint.
+
+A FetchEngine runs a function over many items on a thread pool, keeps results
+in input order, retries transient failures with exponential backoff and
+throttles requests per host so a dashboard cannot flood the XNAT server.
+"""
+import contextvars
+import functools
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from xnat.exceptions import XNATResponseError
+    RETRYABLE_ERRORS = (OSError, XNATResponseError)
+except ImportError:
+    RETRYABLE_ERRORS = (OSError,)
+
+DEFAULT_WORKERS = 16
+
+
+def is_transient(error):
+    """Whether a failed request is worth retrying: connection errors, timeouts, 429 and 5xx responses."""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, OSError)
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` calls per second with bursts of up to ``burst`` calls."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+
+def host_rate_limiter(host, rate):
+    """Return the limiter shared by every engine that talks to ``host``."""
+    with _host_limiters_lock:
+        limiter = _host_limiters.get(host)
+        if limiter is None or limiter.rate != rate:
+            limiter = _host_limiters[host] = RateLimiter(rate)
+        return limiter
+
+
+def widen_connection_pool(connection, size=DEFAULT_WORKERS):
+    """Let an XNAT connection keep ``size`` sockets open so parallel requests are not serialized by the pool."""
+    from requests.adapters import HTTPAdapter
+
+    session = connection.interface
+    current = session.get_adapter('https://')
+    if getattr(current, '_pool_maxsize', 0) >= size:
+        return
+
+    adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+class FetchEngine:
+    """
+    Ordered parallel map with retries and per-host rate limiting.
+
+    ``max_workers`` and the per-host ``rate`` (requests per second, unlimited when
+    unset or not positive) default to ``DASHBOARD_FETCH_WORKERS`` and
+    ``DASHBOARD_FETCH_RATE``. Only transient failures (see ``is_transient``)
+    are retried; a missing or forbidden resource fails at once.
+    """
+
+    def __init__(self, max_workers=None, host=None, rate=None, retries=3, backoff=0.5,
+                 retry_on=RETRYABLE_ERRORS):
+        self.max_workers = int(max_workers or os.getenv('DASHBOARD_FETCH_WORKERS', DEFAULT_WORKERS))
+        rate = float(rate or os.getenv('DASHBOARD_FETCH_RATE') or 0)
+        self.limiter = host_rate_limiter(host, rate) if rate > 0 else None
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_on = retry_on
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='xnat-fetch')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def call(self, func, *args, **kwargs):
+        """Call ``func`` in the current thread, honouring the rate limit and retry policy."""
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                return func(*args, **kwargs)
+            except self.retry_on as error:
+                if attempt == self.retries or not is_transient(error):
+                    raise
+                time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def submit(self, func, *args, **kwargs):
+        """Schedule a single call on the pool and return its future."""
+        # Run in a copy of the caller's context so request tracing follows the work onto the pool
+        return self._executor.submit(contextvars.copy_context().run, self.call, func, *args, **kwargs)
+
+    def imap(self, func, items):
+        """Yield ``func(item)`` for every item, in input order, while later items are still being fetched."""
+        futures = [self.submit(func, item) for item in items]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def map(self, func, items):
+        """Return ``[func(item) for item in items]`` computed in parallel."""
+        return list(self.imap(func, items))
+
+
+@functools.lru_cache(maxsize=None)
+def default_engine(host=None):
+    """The process-wide engine for ``host``, configured from the environment."""
+    return FetchEngine(host=host)
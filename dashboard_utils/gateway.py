@@ -0,0 +1,94 @@
+"""
+Client for the project-data gateway served by ``flask/app.py``.
+
+The gateway keeps one warm copy of each project's tables and answers with
+Arrow IPC streams (or compact JSON), ETags and gzip. Dashboards that set
+``DASHBOARD_GATEWAY_URL`` read their tables from it instead of opening their
+own XNAT connection and crawling the project again.
+"""
+import functools
+import io
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import requests
+
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+
+
+def encode_frame(df, format='arrow'):
+    """Serialize a frame as an Arrow IPC stream or as compact ``{"columns": [...], "data": [...]}`` JSON."""
+    if format == 'arrow':
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if any(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes):
+            # The pandas metadata would name Arrow-backed dtypes that read_pandas cannot rebuild
+            table = table.replace_schema_metadata()
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    return df.to_json(orient='split', index=False, date_format='iso').encode()
+
+
+def decode_frame(content, content_type):
+    """Inverse of encode_frame, picking the format from the response content type."""
+    if content_type and content_type.startswith(ARROW_STREAM):
+        return pa.ipc.open_stream(content).read_pandas()
+    return pd.read_json(io.BytesIO(content), orient='split')
+
+
+class GatewayClient:
+    """Fetches project tables from the gateway, revalidating cached copies with If-None-Match."""
+
+    def __init__(self, base_url, session=None, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def get_frame(self, path):
+        url = f'{self.base_url}{path}'
+        headers = {'Accept': ARROW_STREAM}
+
+        with self._lock:
+            cached = self._frames.get(url)
+        if cached is not None:
+            headers['If-None-Match'] = cached[0]
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached is not None:
+            return cached[1]
+        response.raise_for_status()
+
+        frame = decode_frame(response.content, response.headers.get('Content-Type'))
+        etag = response.headers.get('ETag')
+        if etag:
+            with self._lock:
+                self._frames[url] = (etag, frame)
+        return frame
+
+    def subjects(self, project_id):
+        return self.get_frame(f'/api/projects/{project_id}/subjects')
+
+    def subject_summary(self, project_id):
+        """Age histogram and gender counts of a project, as computed by the gateway."""
+        response = self.session.get(f'{self.base_url}/api/projects/{project_id}/subjects/summary', timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def experiments(self, project_id):
+        return self.get_frame(f'/api/projects/{project_id}/experiments')
+
+    def scan_files(self, project_id, session, scan_id):
+        return self.get_frame(f'/api/projects/{project_id}/experiments/{session}/scans/{scan_id}/files')
+
+
+@functools.lru_cache(maxsize=None)
+def default_gateway():
+    """Client for ``DASHBOARD_GATEWAY_URL``, or None when no gateway is configured."""
+    base_url = os.getenv('DASHBOARD_GATEWAY_URL')
+    return GatewayClient(base_url) if base_url else None
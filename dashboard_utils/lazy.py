@@ -0,0 +1,46 @@
+"""
+Modules imported on first use instead of at start-up.
+
+``plt = lazy_import('matplotlib.pyplot')`` binds a stand-in that imports the
+real module the first time one of its attributes is read. A dashboard then pays
+for a plotting or imaging library only when it first draws a chart or decodes a
+DICOM file, not before its first page is served. Set
+``DASHBOARD_LAZY_IMPORTS=0`` to import everything up front instead, e.g. to
+surface a missing dependency at start-up or to measure the eager start-up time.
+
+Bind the module and reach its contents through attributes: ``from x import y``
+reads ``y`` at import time and so cannot be deferred.
+"""
+import importlib
+import os
+import sys
+import types
+
+
+def lazy_imports_enabled():
+    return os.getenv('DASHBOARD_LAZY_IMPORTS', '1') != '0'
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that is imported when one of its attributes is first read."""
+
+    def _load(self):
+        # import_module returns the cached module after the first call, and is thread-safe
+        return importlib.import_module(self.__name__)
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return f'<lazy module {self.__name__!r}>'
+
+
+def lazy_import(name):
+    """Module ``name`` as a LazyModule, or the module itself if it is already imported or lazy imports are off."""
+    module = sys.modules.get(name)
+    if module is not None or not lazy_imports_enabled():
+        return module or importlib.import_module(name)
+    return LazyModule(name)
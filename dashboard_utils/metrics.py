@@ -0,0 +1,285 @@
+"""
+Request tracing for the XNAT connections used by the dashboards.
+
+``instrument_connection`` hooks the connection's requests session so every
+REST call (including the ones XNATpy issues behind lazy properties) is counted
+with its bytes and latency, per endpoint and per dashboard callback. Callbacks
+are marked with ``traced``; when one finishes, a structured log record lists
+its request count, bytes, duration and slowest calls, which makes N+1 patterns
+obvious; set ``DASHBOARD_CALLBACK_LOG`` to write those records even when the
+app configures no logging. ``render_prometheus`` exposes the totals in the Prometheus text
+format; ``start_metrics_server`` serves them for apps without a route of
+their own.
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+SLOWEST_CALLS = 5
+
+# Path segments that are followed by an identifier in XNAT REST URLs
+_ID_COLLECTIONS = {'projects', 'subjects', 'experiments', 'scans', 'resources', 'assessors', 'reconstructions'}
+
+_current_trace = contextvars.ContextVar('dashboard_trace', default=None)
+
+
+def endpoint_template(url):
+    """Collapse identifiers in an XNAT URL, e.g. ``/data/projects/P1/subjects`` -> ``/data/projects/{id}/subjects``."""
+    segments = urlsplit(url).path.split('/')
+    template = []
+    for index, segment in enumerate(segments):
+        previous = segments[index - 1] if index else ''
+        if previous == 'files':
+            template.append('{file}')
+            break
+        template.append('{id}' if previous in _ID_COLLECTIONS else segment)
+    return re.sub(r'/+', '/', '/'.join(template)) or '/'
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.buckets[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe counters and latency histograms for XNAT requests and traced callbacks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.request_latency = defaultdict(_Histogram)
+        self.callback_latency = defaultdict(_Histogram)
+
+    def record_request(self, dashboard, callback, endpoint, method, status, size, latency):
+        labels = (('dashboard', dashboard), ('callback', callback), ('endpoint', endpoint),
+                  ('method', method), ('status', str(status)))
+        with self._lock:
+            self.requests[labels] += 1
+            self.bytes[labels] += size
+            self.request_latency[labels[:4]].observe(latency)
+
+    def record_callback(self, dashboard, callback, latency):
+        with self._lock:
+            self.callback_latency[(('dashboard', dashboard), ('callback', callback))].observe(latency)
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.bytes.clear()
+            self.request_latency.clear()
+            self.callback_latency.clear()
+
+
+registry = MetricsRegistry()
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    return '{' + ','.join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for key, value in pairs) + '}'
+
+
+def _render_histogram(lines, name, histograms):
+    for labels, histogram in sorted(histograms.items()):
+        for bound, count in zip(LATENCY_BUCKETS, histogram.buckets):
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{_labels(labels, le=le)} {count}')
+        lines.append(f'{name}_sum{_labels(labels)} {histogram.sum:.6f}')
+        lines.append(f'{name}_count{_labels(labels)} {histogram.count}')
+
+
+def render_prometheus(metrics=registry):
+    """All metrics in the Prometheus text exposition format."""
+    with metrics._lock:
+        lines = [
+            '# HELP xnat_requests_total XNAT REST requests issued by the dashboards.',
+            '# TYPE xnat_requests_total counter',
+        ]
+        lines += [f'xnat_requests_total{_labels(labels)} {count}' for labels, count in sorted(metrics.requests.items())]
+
+        lines += [
+            '# HELP xnat_response_bytes_total Bytes received from XNAT (from Content-Length).',
+            '# TYPE xnat_response_bytes_total counter',
+        ]
+        lines += [f'xnat_response_bytes_total{_labels(labels)} {size}' for labels, size in sorted(metrics.bytes.items())]
+
+        lines += [
+            '# HELP xnat_request_duration_seconds Time until XNAT sent the response headers.',
+            '# TYPE xnat_request_duration_seconds histogram',
+        ]
+        _render_histogram(lines, 'xnat_request_duration_seconds', metrics.request_latency)
+
+        lines += [
+            '# HELP dashboard_callback_duration_seconds Wall time of traced dashboard callbacks.',
+            '# TYPE dashboard_callback_duration_seconds histogram',
+        ]
+        _render_histogram(lines, 'dashboard_callback_duration_seconds', metrics.callback_latency)
+
+    return '\n'.join(lines) + '\n'
+
+
+def instrument_connection(connection, dashboard, metrics=registry):
+    """Record every request made through an XNAT connection under the ``dashboard`` label."""
+    session = connection.interface
+    if getattr(session, '_dashboard_metrics', None) is not None:
+        return connection
+
+    def record(response, *args, **kwargs):
+        trace = _current_trace.get()
+        latency = response.elapsed.total_seconds()
+        size = int(response.headers.get('Content-Length') or 0)
+        endpoint = endpoint_template(response.request.url)
+
+        metrics.record_request(
+            dashboard, trace.callback if trace else '', endpoint,
+            response.request.method, response.status_code, size, latency,
+        )
+        if trace is not None:
+            trace.add(latency, size, response.request.method, endpoint, response.request.url)
+        return response
+
+    session.hooks['response'].append(record)
+    session._dashboard_metrics = metrics
+    return connection
+
+
+@functools.lru_cache(maxsize=None)
+def _callback_log():
+    """
+    The logger of the per-callback records, writing them one JSON object per line if ``DASHBOARD_CALLBACK_LOG`` is set.
+
+    ``1`` writes to stderr, any other value is a file to append to. Without it
+    the records are only emitted by whatever logging the app configures.
+    """
+    target = os.getenv('DASHBOARD_CALLBACK_LOG', '')
+    if target and target != '0':
+        handler = logging.StreamHandler(sys.stderr) if target == '1' else logging.FileHandler(target)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        # The records are complete on their own; a root handler would print them twice
+        logger.propagate = False
+    return logger
+
+
+class _Trace:
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = 0
+        self.bytes = 0
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add(self, latency, size, method, endpoint, url):
+        with self._lock:
+            self.requests += 1
+            self.bytes += size
+            self.calls.append((latency, method, endpoint, url))
+
+
+class traced(contextlib.ContextDecorator):
+    """
+    Attribute the XNAT requests made inside a block or function to a dashboard callback.
+
+    Usable as ``@traced('load_subjects', dashboard='panel-project-overview')``
+    or as a ``with`` block. Requests issued on FetchEngine workers are included.
+    """
+
+    def __init__(self, callback, dashboard='', metrics=registry):
+        self.callback = callback
+        self.dashboard = dashboard
+        self.metrics = metrics
+        self._state = threading.local()
+
+    def __enter__(self):
+        trace = _Trace(self.callback)
+        self._state.stack = getattr(self._state, 'stack', [])
+        self._state.stack.append((trace, _current_trace.set(trace), time.perf_counter()))
+        return trace
+
+    def __exit__(self, *exc_info):
+        trace, token, started = self._state.stack.pop()
+        _current_trace.reset(token)
+        duration = time.perf_counter() - started
+
+        self.metrics.record_callback(self.dashboard, self.callback, duration)
+        slowest = sorted(trace.calls, reverse=True)[:SLOWEST_CALLS]
+        _callback_log().info(json.dumps({
+            'event': 'dashboard_callback',
+            'dashboard': self.dashboard,
+            'callback': self.callback,
+            'duration_s': round(duration, 4),
+            'xnat_requests': trace.requests,
+            'xnat_bytes': trace.bytes,
+            'slowest': [
+                {'latency_s': round(latency, 4), 'method': method, 'endpoint': endpoint, 'url': url}
+                for latency, method, endpoint, url in slowest
+            ],
+        }))
+        return False
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None):
+    """
+    Serve ``/metrics`` on a background thread, once per process.
+
+    The port defaults to ``DASHBOARD_METRICS_PORT``; nothing is started when neither is set.
+    """
+    global _server
+    port = port or os.getenv('DASHBOARD_METRICS_PORT')
+    if not port:
+        return None
+
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(('0.0.0.0', int(port)), _MetricsHandler)
+            except OSError:
+                # Another worker on this host already serves the port
+                logger.warning('Metrics port %s is in use, not starting a metrics server', port)
+                return None
+            threading.Thread(target=_server.serve_forever, name='dashboard-metrics', daemon=True).start()
+        return _server
@@ -0,0 +1,102 @@
+"""
+Data path for the image session montages.
+
+Slices are picked from the scan's header-only series index (see ``series``),
+and only the ones that end up in the rows x cols grid are downloaded. They are
+fetched in parallel and each response body is parsed by pydicom from memory,
+so no temporary files are written. Decoded slices are kept in the thumbnail
+pyramid, so later renders of the same session do not download them again, and
+finished montage images are kept in an in-process LRU cache shared by every
+viewer served from the same process.
+"""
+import io
+import os
+
+import numpy as np
+
+from .cache import ByteLRUCache
+from .fetch import default_engine, widen_connection_pool
+from .render import render_montage
+from .series import default_window, first_scan_id, pydicom, scan_index
+from .thumbnails import default_thumbnail_store, pyramid_level
+
+montage_cache = ByteLRUCache(int(float(os.getenv('DASHBOARD_MONTAGE_CACHE_MB', 256)) * 2 ** 20))
+
+
+def montage_files(connection, xnat_host, project_id, session, rows, cols, scan_id=None, engine=None):
+    """Return ``(scan_id, [(name, uri), ...])`` for the slices of a rows x cols montage, picked from the series index."""
+    if scan_id is None:
+        scan_id = first_scan_id(connection, xnat_host, project_id, session)
+
+    index = scan_index(connection, xnat_host, project_id, session, scan_id, engine=engine)
+    selected = index.iloc[montage_slice_indices(len(index), rows, cols)]
+    return scan_id, list(zip(selected['name'], selected['uri']))
+
+
+def montage_slice_indices(slice_count, rows, cols):
+    """Indices of the slices shown in a rows x cols montage, evenly spaced through the series."""
+    tiles = min(rows * cols, slice_count)
+    return [int(j) for j in np.linspace(0, slice_count - 1, num=tiles)]
+
+
+def read_dicom(connection, uri, **kwargs):
+    """Download a DICOM file and parse it from memory."""
+    response = connection.get(uri)
+    return pydicom.dcmread(io.BytesIO(response.content), **kwargs)
+
+
+def fetch_montage_images(connection, xnat_host, project_id, session, rows, cols, scan_id=None,
+                         size=None, engine=None, store=None):
+    """
+    Return the pixel arrays of a rows x cols montage at a pyramid level that fits its tiles.
+
+    Slices already in the thumbnail store are memory-mapped from disk; the rest
+    are downloaded in parallel, decoded once and added to the store.
+    """
+    scan_id, selected = montage_files(connection, xnat_host, project_id, session, rows, cols, scan_id, engine)
+
+    size = size or pyramid_level(rows, cols)
+    store = store or default_thumbnail_store()
+    engine = engine or default_engine()
+
+    def load(file):
+        name, uri = file
+        return store.get_or_create(
+            xnat_host, project_id, session, scan_id, name, size,
+            decode=lambda: read_dicom(connection, uri).pixel_array,
+        )
+
+    cached = [store.get(xnat_host, project_id, session, scan_id, name, size) for name, _ in selected]
+    missing = [file for file, image in zip(selected, cached) if image is None]
+    if missing:
+        widen_connection_pool(connection, engine.max_workers)
+        fetched = iter(engine.map(load, missing))
+        cached = [image if image is not None else next(fetched) for image in cached]
+
+    return cached
+
+
+def render_session_montage(connection, xnat_host, project_id, session, rows, cols, invert=False,
+                           scan_id=None, window=None, format='png', cache=None, engine=None):
+    """
+    Return the encoded montage image for a session, rendering it only on a cache miss.
+
+    Without a ``window`` the one the series' headers declare is used, and each
+    tile is scaled to its own min/max when they declare none.
+    """
+    cache = montage_cache if cache is None else cache
+    # Resolved first, so the default scan and the same scan picked by ID share one entry
+    if scan_id is None:
+        scan_id = first_scan_id(connection, xnat_host, project_id, session)
+    key = (xnat_host, project_id, session, scan_id, rows, cols, invert, window, format)
+
+    def render():
+        images = fetch_montage_images(connection, xnat_host, project_id, session, rows, cols, scan_id=scan_id,
+                                      engine=engine)
+        series_window = window
+        if series_window is None:
+            series_window = default_window(scan_index(connection, xnat_host, project_id, session, scan_id,
+                                                      engine=engine))
+        return render_montage(images, rows, cols, invert=invert, window=series_window, format=format)
+
+    return cache.get_or_create(key, render)
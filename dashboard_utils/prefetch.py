@@ -0,0 +1,118 @@
+"""
+Background prefetch of the sessions next to the one a montage viewer shows.
+
+Users tend to step through the session list in order, so once a montage is
+displayed the previous and next few sessions are rendered into the montage
+and thumbnail caches ahead of time. Jobs run on a small process-wide pool and
+download on their own FetchEngine, so they never queue in front of the
+sessions users are waiting for. Moving elsewhere cancels the jobs that have
+not started yet.
+"""
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .fetch import FetchEngine
+from .montage import render_session_montage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RADIUS = 2
+DEFAULT_WORKERS = 2
+DOWNLOAD_WORKERS = 8
+
+
+@functools.lru_cache(maxsize=None)
+def prefetch_executor():
+    """The process-wide pool running prefetch jobs, ``DASHBOARD_PREFETCH_WORKERS`` (2) at a time."""
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv('DASHBOARD_PREFETCH_WORKERS', DEFAULT_WORKERS)),
+        thread_name_prefix='montage-prefetch',
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def prefetch_engine():
+    """The FetchEngine prefetch jobs download slices on, sharing the viewers' rate limit."""
+    # Same limiter key as default_engine(), which every viewer downloads on
+    return FetchEngine(max_workers=DOWNLOAD_WORKERS)
+
+
+def neighbours(labels, session, radius):
+    """
+    Labels within ``radius`` of ``session``, nearest first, alternating next and previous.
+
+    Empty labels, such as a dropdown's "no selection" placeholder, are skipped.
+    """
+    labels = [label for label in labels if label]
+    try:
+        position = labels.index(session)
+    except ValueError:
+        return []
+
+    nearby = []
+    for distance in range(1, radius + 1):
+        for index in (position + distance, position - distance):
+            if 0 <= index < len(labels):
+                nearby.append(labels[index])
+    return nearby
+
+
+class MontagePrefetcher:
+    """Warms the montages around the session one viewer is looking at."""
+
+    def __init__(self, connection, xnat_host, project_id, radius=None, executor=None, engine=None):
+        self.connection = connection
+        self.xnat_host = xnat_host
+        self.project_id = project_id
+        self.radius = int(radius or os.getenv('DASHBOARD_PREFETCH_RADIUS', DEFAULT_RADIUS))
+        self.executor = executor or prefetch_executor()
+        self.engine = engine or prefetch_engine()
+
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def prefetch_around(self, labels, session, rows, cols, invert=False, scan_id=None, **options):
+        """
+        Prefetch the montages next to ``session`` in ``labels``, as ``rows`` x ``cols`` with the given options.
+
+        With ``scan_id`` None the first scan of every neighbour is rendered,
+        which is what the viewers show after switching sessions. Jobs for
+        montages that are no longer nearby are cancelled if they have not started.
+        """
+        options = dict(options, scan_id=scan_id)
+        wanted = {
+            (label, rows, cols, invert, tuple(sorted(options.items()))): label
+            for label in neighbours(list(labels), session, self.radius)
+        }
+
+        with self._lock:
+            for key, future in list(self._jobs.items()):
+                if (key not in wanted and future.cancel()) or future.done():
+                    del self._jobs[key]
+
+            for key, label in wanted.items():
+                if key not in self._jobs:
+                    self._jobs[key] = self.executor.submit(self._render, label, rows, cols, invert, options)
+
+    def _render(self, session, rows, cols, invert, options):
+        try:
+            render_session_montage(self.connection, self.xnat_host, self.project_id, session, rows, cols,
+                                   invert=invert, engine=self.engine, **options)
+        except Exception as error:
+            # A failed prefetch only means the viewer fetches the session itself later
+            logger.debug('Prefetching %s failed: %s', session, error)
+
+    def cancel(self):
+        """Cancel every job that has not started, e.g. when the viewer clears its selection."""
+        with self._lock:
+            for future in self._jobs.values():
+                future.cancel()
+            self._jobs.clear()
+
+    def pending(self):
+        """Number of jobs queued or running."""
+        with self._lock:
+            return sum(not future.done() for future in self._jobs.values())
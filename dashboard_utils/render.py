@@ -0,0 +1,76 @@
+"""
+Single-image montage rendering.
+
+The selected slices are tiled into one array, windowed and optionally inverted
+in one vectorized pass, and encoded once as PNG or WebP. This replaces a
+matplotlib subplot grid with one ``imshow`` per tile.
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+
+def _stack(images):
+    """Stack images into one (n, height, width) float32 array, zero-padding smaller ones."""
+    height = max(image.shape[0] for image in images)
+    width = max(image.shape[1] for image in images)
+
+    if all(image.shape[:2] == (height, width) for image in images):
+        return np.stack(images).astype(np.float32, copy=False)
+
+    stack = np.zeros((len(images), height, width), dtype=np.float32)
+    for tile, image in zip(stack, images):
+        tile[:image.shape[0], :image.shape[1]] = image
+    return stack
+
+
+def tile_montage(images, rows, cols, invert=False, window=None):
+    """
+    Tile up to rows x cols grayscale images into one uint8 array.
+
+    Each tile is scaled to its own min/max like ``imshow`` does, unless a
+    ``(center, width)`` window is given, which is then applied to every tile.
+    Unused grid cells stay black.
+    """
+    images = list(images)[:rows * cols]
+    if not images:
+        return np.zeros((rows, cols), dtype=np.uint8)
+
+    stack = _stack(images)
+
+    if window is None:
+        low = stack.min(axis=(1, 2), keepdims=True)
+        high = stack.max(axis=(1, 2), keepdims=True)
+    else:
+        center, width = window
+        low = np.float32(center - width / 2)
+        high = np.float32(center + width / 2)
+
+    span = high - low
+    scale = np.float32(255) / np.where(span > 0, span, np.inf).astype(np.float32)
+    stack -= low
+    stack *= scale
+    np.clip(stack, 0, 255, out=stack)
+    if invert:
+        np.subtract(255, stack, out=stack)
+
+    count, height, width = stack.shape
+    grid = np.zeros((rows * cols, height, width), dtype=np.uint8)
+    grid[:count] = stack
+    return grid.reshape(rows, cols, height, width).swapaxes(1, 2).reshape(rows * height, cols * width)
+
+
+def encode_image(pixels, format='png', quality=85):
+    """Encode a uint8 array as PNG or WebP bytes."""
+    buffer = io.BytesIO()
+    if format == 'webp':
+        Image.fromarray(pixels).save(buffer, format='WEBP', quality=quality)
+    else:
+        Image.fromarray(pixels).save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+def render_montage(images, rows, cols, invert=False, window=None, format='png'):
+    """Tile, window and encode a montage in one go."""
+    return encode_image(tile_montage(images, rows, cols, invert=invert, window=window), format=format)
@@ -0,0 +1,93 @@
+"""
+Rolling mean / residual standard deviation from cumulative sums.
+
+Every window sum is the difference of two entries of a cumulative sum, so a
+rolling mean or standard deviation of any width costs one O(n) vectorized
+array subtraction. The outlier explorer caches the per-(variable, window)
+arrays, and changing only the sigma threshold re-thresholds cached arrays.
+
+Results follow pandas' ``rolling(window)`` semantics: a window with fewer than
+``window`` non-NaN values is NaN, and the standard deviation uses ``ddof=1``.
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+
+
+class _CumulativeSums:
+    """Prefix sums of a series (shifted by its mean for precision) and of its non-NaN count."""
+
+    def __init__(self, values, squares=False):
+        values = np.asarray(values, dtype=np.float64)
+        finite = ~np.isnan(values)
+
+        self.length = len(values)
+        self.offset = np.nanmean(values) if finite.any() else 0.0
+        centered = np.where(finite, values - self.offset, 0.0)
+
+        self.counts = np.concatenate(([0], np.cumsum(finite)))
+        self.sums = np.concatenate(([0.0], np.cumsum(centered)))
+        self.squares = np.concatenate(([0.0], np.cumsum(centered * centered))) if squares else None
+
+    def _window(self, prefix, window):
+        out = np.full(self.length, np.nan)
+        if 0 < window <= self.length:
+            complete = (self.counts[window:] - self.counts[:-window]) == window
+            out[window - 1:] = np.where(complete, prefix[window:] - prefix[:-window], np.nan)
+        return out
+
+    def mean(self, window):
+        return self._window(self.sums, window) / window + self.offset
+
+    def std(self, window):
+        if window < 2:
+            return np.full(self.length, np.nan)
+        sums = self._window(self.sums, window)
+        squares = self._window(self.squares, window)
+        variance = (squares - sums * sums / window) / (window - 1)
+        return np.sqrt(np.maximum(variance, 0.0))
+
+
+def rolling_mean(values, window):
+    """Equivalent of ``pd.Series(values).rolling(window).mean()`` as an array."""
+    return _CumulativeSums(values).mean(window)
+
+
+def rolling_std(values, window):
+    """Equivalent of ``pd.Series(values).rolling(window).std()`` as an array."""
+    return _CumulativeSums(values, squares=True).std(window)
+
+
+class RollingStats:
+    """
+    Rolling average and outliers of every column of a frame.
+
+    The cumulative sums of each variable are built on first use. The rolling
+    mean, the absolute residual against it and the residual's rolling standard
+    deviation are cached per (variable, window).
+    """
+
+    def __init__(self, frame, cache_size=128):
+        self.frame = frame
+        self._sums = {}
+        self._window_stats = functools.lru_cache(maxsize=cache_size)(self._compute_window_stats)
+
+    def _variable_sums(self, variable):
+        if variable not in self._sums:
+            self._sums[variable] = _CumulativeSums(self.frame[variable].to_numpy(dtype=np.float64))
+        return self._sums[variable]
+
+    def _compute_window_stats(self, variable, window):
+        values = self.frame[variable].to_numpy(dtype=np.float64)
+        avg = self._variable_sums(variable).mean(window)
+        residual = values - avg
+        std = _CumulativeSums(residual, squares=True).std(window)
+        return pd.Series(avg, index=self.frame.index, name=variable), np.abs(residual), std
+
+    def transform(self, variable, window, sigma):
+        """Return the rolling average and the points whose residual exceeds ``sigma`` standard deviations."""
+        avg, abs_residual, std = self._window_stats(variable, window)
+        with np.errstate(invalid='ignore'):
+            outliers = abs_residual > std * sigma
+        return avg, avg[outliers]
@@ -0,0 +1,224 @@
+"""
+Scan listings and header-only DICOM series indexes.
+
+Slices are ordered by what their headers say rather than by file names.
+``index_scan`` downloads only the first few kilobytes of every file of a scan
+with HTTP range requests, in parallel, and has pydicom parse them without the
+pixel data. The resulting table (instance number, slice location, size,
+window defaults and rescale per file) is kept in the project snapshot
+directory, so the montages can pick slices without touching pixel data again.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+from collections import namedtuple
+
+import pandas as pd
+
+from .cache import TTLCache
+from .fetch import default_engine, widen_connection_pool
+from .gateway import default_gateway
+from .lazy import lazy_import
+from .snapshot import _slug, default_store
+
+# Imported on the first header read, so dashboards start without it
+pydicom = lazy_import('pydicom')
+
+SERIES_COLUMNS = [
+    'name', 'uri', 'instance_number', 'slice_location', 'rows', 'cols', 'window_center', 'window_width',
+    'rescale_intercept', 'rescale_slope',
+]
+
+# Seconds a scan listing is reused before XNAT is asked again
+DEFAULT_SCAN_LIST_TTL = 300
+
+# Bytes requested first; enough for the header of most files
+HEADER_BYTES = 8 * 1024
+
+# Rescale Slope (0028,1053) is the last element the index needs
+_LAST_INDEXED_TAG = 0x00281053
+# Pixel Data (7FE0,0010) as it appears in little endian files; everything before it is header
+_PIXEL_DATA_MARKER = b'\xe0\x7f\x10\x00'
+
+Scan = namedtuple('Scan', ['id', 'type', 'series_description'])
+
+_scan_lists = TTLCache(max_entries=256)
+
+
+def list_scans(connection, xnat_host, project_id, session):
+    """
+    Return the scans of a session as ``Scan`` tuples, in XNAT's order.
+
+    Listings are shared by every connection to the same host and reused for
+    DASHBOARD_SESSION_TTL seconds, so scans added to a session show up after
+    at most that long.
+    """
+    def load():
+        result = connection.get_json(
+            f'/data/projects/{project_id}/experiments/{session}/scans',
+            query={'format': 'json', 'columns': 'ID,type,series_description'},
+        )
+        return tuple(
+            Scan(row['ID'], row.get('type', ''), row.get('series_description', ''))
+            for row in result['ResultSet']['Result']
+        )
+
+    ttl = float(os.getenv('DASHBOARD_SESSION_TTL', DEFAULT_SCAN_LIST_TTL))
+    return _scan_lists.get_or_create((xnat_host, project_id, session), load, ttl)
+
+
+def first_scan_id(connection, xnat_host, project_id, session):
+    """Return the ID of the first scan of a session, which the montages show unless told otherwise."""
+    scans = list_scans(connection, xnat_host, project_id, session)
+    if not scans:
+        raise ValueError(f'Session {session} has no scans')
+    return scans[0].id
+
+
+def list_scan_files(connection, project_id, session, scan_id):
+    """Return ``(name, uri, size)`` for every file of a scan, as XNAT lists them."""
+    result = connection.get_json(
+        f'/data/projects/{project_id}/experiments/{session}/scans/{scan_id}/files',
+        query={'format': 'json'},
+    )
+    return [(row['Name'], row['URI'], int(row.get('Size') or 0)) for row in result['ResultSet']['Result']]
+
+
+def get_scan_files(connection, project_id, session, scan_id):
+    """Like list_scan_files, but from the shared gateway if one is configured."""
+    gateway = default_gateway()
+    if gateway is not None:
+        files = gateway.scan_files(project_id, session, scan_id)
+        return [(name, uri, int(size)) for name, uri, size in files[['name', 'uri', 'size']].itertuples(index=False)]
+
+    return list_scan_files(connection, project_id, session, scan_id)
+
+
+def is_dicom_name(name):
+    """DICOM files are named ``*.dcm`` or have no extension at all."""
+    return name.lower().endswith('.dcm') or '.' not in name
+
+
+def read_dicom_header(connection, uri, size=HEADER_BYTES):
+    """
+    Parse a DICOM file up to its pixel data from a ranged download.
+
+    The range is widened until it reaches the pixel data or covers every
+    element the index reads; servers that ignore ``Range`` send the whole file.
+    """
+    while True:
+        response = connection.get(uri, headers={'Range': f'bytes=0-{size - 1}'}, accepted_status=[200, 206])
+        data = response.content
+        complete = response.status_code != 206 or len(data) < size or _PIXEL_DATA_MARKER in data
+
+        try:
+            ds = pydicom.dcmread(io.BytesIO(data), stop_before_pixels=True)
+        except Exception:
+            # A header cut off mid-element can fail to parse; only a complete header is an error
+            if complete:
+                raise
+        else:
+            if complete or (len(ds) and max(ds.keys()) > _LAST_INDEXED_TAG):
+                return ds
+        size *= 4
+
+
+def _number(value, cast):
+    if isinstance(value, pydicom.multival.MultiValue):
+        value = value[0] if len(value) else None
+    if value is None or value == '':
+        return None
+    return cast(value)
+
+
+def _slice_order(record):
+    """Order by instance number, then slice location, then naturally by file name."""
+    name, _, instance_number, slice_location = record[:4]
+    return (
+        instance_number is None, instance_number or 0,
+        slice_location is None, slice_location or 0.0,
+        [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)],
+    )
+
+
+def series_frame(records):
+    """Build the typed series index from records in SERIES_COLUMNS order."""
+    df = pd.DataFrame.from_records(list(records), columns=SERIES_COLUMNS)
+
+    for column in ('name', 'uri'):
+        df[column] = df[column].astype('string')
+    df['instance_number'] = df['instance_number'].astype('Int64')
+    for column in ('rows', 'cols'):
+        df[column] = df[column].astype('Int32')
+    for column in ('slice_location', 'window_center', 'window_width', 'rescale_intercept', 'rescale_slope'):
+        df[column] = df[column].astype('float64')
+
+    return df
+
+
+def index_scan(connection, project_id, session, scan_id, files=None, engine=None):
+    """Read the header of every DICOM file of a scan in parallel and return them in slice order."""
+    if files is None:
+        files = get_scan_files(connection, project_id, session, scan_id)
+    files = [(name, uri) for name, uri, _ in files if is_dicom_name(name)]
+
+    engine = engine or default_engine()
+    widen_connection_pool(connection, engine.max_workers)
+    headers = engine.map(lambda file: read_dicom_header(connection, file[1]), files)
+
+    records = [
+        (
+            name, uri,
+            _number(ds.get('InstanceNumber'), int),
+            _number(ds.get('SliceLocation'), float),
+            _number(ds.get('Rows'), int),
+            _number(ds.get('Columns'), int),
+            _number(ds.get('WindowCenter'), float),
+            _number(ds.get('WindowWidth'), float),
+            _number(ds.get('RescaleIntercept'), float),
+            _number(ds.get('RescaleSlope'), float),
+        )
+        for (name, uri), ds in zip(files, headers)
+    ]
+    return series_frame(sorted(records, key=_slice_order))
+
+
+def scan_index(connection, xnat_host, project_id, session, scan_id, store=None, engine=None):
+    """
+    The series index of a scan, from the snapshot directory when the scan's file listing is unchanged.
+
+    Past the snapshot TTL one file listing request checks the stored index;
+    the headers are only read again when files were added, removed or resized.
+    """
+    store = store or default_store()
+    listing = []
+
+    def fingerprint():
+        listing[:] = get_scan_files(connection, project_id, session, scan_id)
+        return hashlib.sha1(json.dumps(sorted(listing)).encode()).hexdigest()
+
+    return store.get_or_load(
+        xnat_host, project_id, os.path.join('series', _slug(session), _slug(scan_id)),
+        loader=lambda: index_scan(connection, project_id, session, scan_id, files=listing, engine=engine),
+        fingerprint=fingerprint,
+    )
+
+
+def default_window(index):
+    """
+    The (center, width) most slices of a series declare, or None when they declare none.
+
+    DICOM windows apply to rescaled values (e.g. Hounsfield units), while the
+    montages tile the stored pixel values, so the window is returned in stored
+    units using the slices' rescale slope and intercept.
+    """
+    windows = index[['window_center', 'window_width', 'rescale_intercept', 'rescale_slope']]
+    # Slices without rescale tags store the values the window applies to
+    windows = windows.fillna({'rescale_intercept': 0.0, 'rescale_slope': 1.0}).dropna()
+    windows = windows[windows['rescale_slope'] != 0]
+    if windows.empty:
+        return None
+    center, width, intercept, slope = windows.value_counts().index[0]
+    return (float(center) - float(intercept)) / float(slope), float(width) / abs(float(slope))
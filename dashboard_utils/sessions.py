@@ -0,0 +1,193 @@
+"""
+Image session (experiment) listings for a project.
+
+One listing request returns every experiment of the project with the columns
+the dashboards need, instead of materializing ``project.experiments`` objects.
+``SessionIndex`` keeps the labels sorted in memory for type-ahead pickers and
+reloads them in the background, so pages never wait on the listing.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+
+import pandas as pd
+
+from .fetch import default_engine
+from .gateway import default_gateway
+
+logger = logging.getLogger(__name__)
+
+EXPERIMENT_COLUMNS = ['id', 'label', 'subject', 'date', 'xsi_type']
+
+EXPERIMENT_LISTING_COLUMNS = 'ID,label,subject_label,date,xsiType'
+
+DEFAULT_INDEX_TTL = 300
+
+# Seconds after a failed load before a search starts another one
+DEFAULT_RETRY_DELAY = 10
+
+SearchPage = namedtuple('SearchPage', ['labels', 'total', 'page', 'page_count'])
+
+
+def experiments_frame(records):
+    """Build the typed experiment table from (id, label, subject, date, xsi_type) records."""
+    df = pd.DataFrame.from_records(list(records), columns=EXPERIMENT_COLUMNS)
+
+    for column in ('id', 'label', 'subject'):
+        df[column] = df[column].astype('string')
+    df['date'] = pd.to_datetime(df['date'].replace('', None), errors='coerce')
+    df['xsi_type'] = df['xsi_type'].astype('category')
+
+    return df
+
+
+def load_experiments(connection, project_id):
+    """Load every experiment of a project with one XNAT request, sorted by label."""
+    result = connection.get_json(
+        f'/data/projects/{project_id}/experiments',
+        query={'columns': EXPERIMENT_LISTING_COLUMNS},
+    )
+
+    df = experiments_frame(
+        (row.get('ID'), row.get('label'), row.get('subject_label'), row.get('date'), row.get('xsiType'))
+        for row in result['ResultSet']['Result']
+    )
+    return df.sort_values('label', ignore_index=True)
+
+
+def get_experiments(connection, project_id):
+    """Experiment table for a dashboard: from the shared gateway if one is configured, otherwise from XNAT."""
+    gateway = default_gateway()
+    if gateway is not None:
+        return gateway.experiments(project_id)
+
+    return load_experiments(connection, project_id)
+
+
+class SessionIndex:
+    """
+    Case-insensitively sorted session labels of a project, searchable by prefix.
+
+    The labels are loaded on a FetchEngine worker. Until the first load
+    finishes, searches return no labels; after ``ttl`` seconds the next search
+    starts a reload and keeps answering from the current labels meanwhile.
+    A failed load is kept in ``error`` until a later one succeeds, and
+    searches retry it after ``retry_delay`` seconds.
+    """
+
+    def __init__(self, connection, project_id, ttl=None, engine=None, retry_delay=DEFAULT_RETRY_DELAY):
+        self.connection = connection
+        self.project_id = project_id
+        self.ttl = float(ttl if ttl is not None else os.getenv('DASHBOARD_SESSION_TTL', DEFAULT_INDEX_TTL))
+        self.engine = engine or default_engine()
+        self.retry_delay = retry_delay
+        self.error = None
+
+        self._labels = []
+        self._keys = []
+        self._loaded = None
+        self._failed = None
+        self._pending = None
+        self._listeners = []
+        self._ready = threading.Event()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._labels)
+
+    @property
+    def ready(self):
+        """Whether the labels have been loaded at least once."""
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def add_listener(self, callback):
+        """Call ``callback(index)`` after every reload, failed or not, and at once if the labels are already loaded."""
+        with self._lock:
+            self._listeners.append(callback)
+        if self.ready:
+            callback(self)
+
+    def refresh(self):
+        """Start reloading the labels in the background, unless a reload is already running."""
+        with self._lock:
+            if self._pending is None:
+                self._pending = self.engine.submit(self._load)
+                self._pending.add_done_callback(self._finished)
+            return self._pending
+
+    def _load(self):
+        labels = sorted(get_experiments(self.connection, self.project_id)['label'].dropna(), key=str.casefold)
+        keys = [label.casefold() for label in labels]
+
+        with self._lock:
+            self._labels, self._keys = labels, keys
+            self._loaded = time.monotonic()
+            self.error = None
+            listeners = list(self._listeners)
+        self._ready.set()
+
+        for listener in listeners:
+            listener(self)
+        return len(labels)
+
+    def _finished(self, future):
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            self._pending = None
+            if error is not None:
+                self.error = error
+                self._failed = time.monotonic()
+            listeners = list(self._listeners)
+
+        if error is not None:
+            logger.warning('Could not load the sessions of %s: %s', self.project_id, error)
+            for listener in listeners:
+                listener(self)
+
+    def search(self, prefix='', page=0, page_size=50):
+        """Return one page of the labels starting with ``prefix``, ignoring case."""
+        now = time.monotonic()
+        stale = self._loaded is None or now - self._loaded > self.ttl
+        if stale and (self._failed is None or now - self._failed > self.retry_delay):
+            self.refresh()
+
+        with self._lock:
+            labels, keys = self._labels, self._keys
+
+        key = prefix.casefold()
+        start = bisect_left(keys, key)
+        stop = bisect_left(keys, key + '\U0010ffff') if key else len(keys)
+
+        total = stop - start
+        page_count = max(1, math.ceil(total / page_size))
+        page = min(max(page, 0), page_count - 1)
+        first = start + page * page_size
+
+        return SearchPage(labels[first:min(first + page_size, stop)], total, page, page_count)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def session_index(connection, xnat_host, project_id):
+    """
+    The process-wide SessionIndex of a project, with its first load already started.
+
+    Every connection to ``xnat_host`` shares one index; reloads use the
+    connection of the latest caller.
+    """
+    with _indexes_lock:
+        index = _indexes.get((xnat_host, project_id))
+        if index is None:
+            index = _indexes[(xnat_host, project_id)] = SessionIndex(connection, project_id)
+            index.refresh()
+        index.connection = connection
+        return index
@@ -0,0 +1,160 @@
+"""
+Compact project tables shared by every dashboard worker on a host.
+
+Tables are published as uncompressed Arrow IPC files in shared memory
+(``/dev/shm`` where it exists) using the narrowest column types that hold the
+data: dictionary-encoded categories and repeated labels, and the smallest
+integer type for whole-number columns such as ages. Workers memory-map the
+file and wrap its buffers in ``pd.ArrowDtype`` columns without copying them,
+so any number of Panel, Dash or Flask workers share one copy of each table
+through the page cache.
+"""
+import functools
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .snapshot import DEFAULT_CACHE_DIR, DEFAULT_TTL, _slug, host_key
+
+DEFAULT_SHARED_DIR = (
+    os.path.join('/dev/shm', 'dashboard-testing') if os.path.isdir('/dev/shm')
+    else os.path.join(DEFAULT_CACHE_DIR, 'shared')
+)
+
+# String columns with at most this share of distinct values are dictionary-encoded
+DICTIONARY_RATIO = 0.5
+
+_INTEGER_TYPES = [pa.uint8(), pa.int8(), pa.uint16(), pa.int16(), pa.uint32(), pa.int32(), pa.int64()]
+
+
+def _integer_type(low, high):
+    for arrow_type in _INTEGER_TYPES:
+        info = np.iinfo(arrow_type.to_pandas_dtype())
+        if info.min <= low and high <= info.max:
+            return arrow_type
+    return pa.int64()
+
+
+def _index_type(size):
+    return pa.int8() if size <= 127 else pa.int16() if size <= 32767 else pa.int32()
+
+
+def compact_column(series):
+    """Convert one column to the smallest Arrow array that holds its values."""
+    dtype = series.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        array = pa.array(series, from_pandas=True)
+        return array.cast(pa.dictionary(_index_type(len(dtype.categories)), array.type.value_type))
+
+    if pd.api.types.is_string_dtype(dtype) or pd.api.types.is_object_dtype(dtype):
+        array = pa.array(series, type=pa.string(), from_pandas=True)
+        distinct = len(pa.compute.unique(array))
+        if len(array) and distinct <= DICTIONARY_RATIO * len(array):
+            return array.dictionary_encode().cast(pa.dictionary(_index_type(distinct), pa.string()))
+        return array
+
+    if pd.api.types.is_float_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        known = values[~np.isnan(values)]
+        if len(known) and np.array_equal(known, np.floor(known)):
+            return pa.array(series, from_pandas=True).cast(_integer_type(known.min(), known.max()))
+
+    return pa.array(series, from_pandas=True)
+
+
+def compact_table(df):
+    """Arrow table of a DataFrame's columns in their compact types; the index is dropped."""
+    return pa.table({column: compact_column(df[column]) for column in df.columns})
+
+
+class SharedTableStore:
+    """
+    Compact tables published to shared memory, keyed by XNAT host, project and table name.
+
+    A published table is reused until it is ``max_age`` seconds old, which
+    defaults to the snapshot TTL (``DASHBOARD_SNAPSHOT_TTL``).
+    """
+
+    def __init__(self, root=None, max_age=None):
+        self.root = root or os.getenv('DASHBOARD_SHARED_DIR', DEFAULT_SHARED_DIR)
+        self.max_age = float(max_age if max_age is not None else os.getenv('DASHBOARD_SNAPSHOT_TTL', DEFAULT_TTL))
+        self._opened = {}
+        self._lock = threading.Lock()
+
+    def path(self, xnat_host, project_id, table):
+        return os.path.join(self.root, host_key(xnat_host), _slug(project_id), f'{table}.arrow')
+
+    def publish(self, xnat_host, project_id, table, df):
+        """Write a table in its compact form, replacing the published one, and return it as opened from shared memory."""
+        path = self.path(xnat_host, project_id, table)
+        data = compact_table(df)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            # Uncompressed, so readers can use the mapped bytes as they are
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, data.schema) as writer:
+                writer.write_table(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        return self.open(xnat_host, project_id, table)
+
+    def open(self, xnat_host, project_id, table):
+        """
+        Return the published table as a DataFrame over the mapped file, or None if there is none.
+
+        Each process maps a published file once; a republished file is mapped again on the next call.
+        """
+        path = self.path(xnat_host, project_id, table)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        version = (stat.st_ino, stat.st_mtime_ns)
+
+        with self._lock:
+            opened = self._opened.get(path)
+        if opened is not None and opened[0] == version:
+            return opened[1]
+
+        try:
+            # Replacing the file later does not invalidate this mapping; it lives as long as the frame
+            with pa.ipc.open_file(pa.memory_map(path)) as reader:
+                data = reader.read_all()
+        except (OSError, ValueError):
+            return None
+        df = data.to_pandas(types_mapper=pd.ArrowDtype)
+
+        with self._lock:
+            self._opened[path] = (version, df)
+        return df
+
+    def get_or_publish(self, xnat_host, project_id, table, load):
+        """Return the published table if it is younger than ``max_age``, otherwise publish ``load()``."""
+        try:
+            age = time.time() - os.stat(self.path(xnat_host, project_id, table)).st_mtime
+        except FileNotFoundError:
+            age = None
+
+        if age is not None and age < self.max_age:
+            df = self.open(xnat_host, project_id, table)
+            if df is not None:
+                return df
+
+        return self.publish(xnat_host, project_id, table, load())
+
+
+@functools.lru_cache(maxsize=None)
+def default_shared_store():
+    """The process-wide store configured from ``DASHBOARD_SHARED_DIR`` and ``DASHBOARD_SNAPSHOT_TTL``."""
+    return SharedTableStore()
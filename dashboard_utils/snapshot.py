@@ -0,0 +1,248 @@
+"""
+On-disk snapshots of project tables.
+
+Tables are written as Arrow IPC (Feather) files under
+``<cache dir>/<host>/<project>/<table>.arrow`` with a small JSON sidecar that
+records when the snapshot was taken and the project fingerprint (last-modified
+timestamp and subject count) it was taken against. A snapshot younger than the
+TTL is returned without contacting XNAT; an older one is revalidated with two
+cheap requests and only reloaded when the fingerprint has changed. Tables can
+also be read and written as a stream of batches, so a page can show the first
+rows while the rest are still arriving.
+"""
+import functools
+import json
+import os
+import re
+import tempfile
+import time
+from urllib.parse import urlparse
+
+import pandas as pd
+import pyarrow as pa
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'dashboard-testing')
+DEFAULT_TTL = 15 * 60
+
+
+def _slug(value):
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', str(value)).strip('_') or '_'
+
+
+def host_key(xnat_host):
+    """Reduce an XNAT host URL to a directory name, e.g. ``https://xnat.org:8443/`` -> ``xnat.org_8443``."""
+    parsed = urlparse(xnat_host if '//' in str(xnat_host) else f'//{xnat_host}')
+    return _slug(parsed.netloc + parsed.path)
+
+
+def frame_batches(df, batch_size):
+    """Split a DataFrame into row slices of up to ``batch_size`` rows."""
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size]
+
+
+def _grow_categories(df, categories):
+    """
+    Give categorical columns every category seen in earlier batches, in first-seen order.
+
+    Arrow IPC files only allow a dictionary to grow between batches, never to be replaced.
+    """
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            known = categories.setdefault(column, [])
+            known.extend(category for category in df[column].cat.categories if category not in known)
+            df[column] = df[column].cat.set_categories(known)
+    return df
+
+
+def _stream_schema(schema):
+    """Widen dictionary fields so later batches with more categories, or none yet, still fit."""
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            values = field.type.value_type
+            field = field.with_type(pa.dictionary(pa.int32(), pa.large_string() if pa.types.is_null(values) else values))
+        fields.append(field)
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+def project_fingerprint(connection, project_id):
+    """Return the values whose change invalidates a project snapshot."""
+    project = connection.get_json(f'/data/projects/{project_id}', query={'format': 'json'})
+    items = project.get('items') or [{}]
+    last_modified = items[0].get('meta', {}).get('last_modified')
+
+    subjects = connection.get_json(
+        f'/data/projects/{project_id}/subjects',
+        query={'format': 'json', 'columns': 'ID'},
+    )
+    subject_count = len(subjects['ResultSet']['Result'])
+
+    return {'last_modified': last_modified, 'subject_count': subject_count}
+
+
+class SnapshotStore:
+    """Arrow IPC snapshots of project tables keyed by XNAT host, project and table name."""
+
+    def __init__(self, root=None, ttl=None):
+        self.root = root or os.getenv('DASHBOARD_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.ttl = float(ttl if ttl is not None else os.getenv('DASHBOARD_SNAPSHOT_TTL', DEFAULT_TTL))
+
+    def _paths(self, xnat_host, project_id, table):
+        directory = os.path.join(self.root, host_key(xnat_host), _slug(project_id))
+        return os.path.join(directory, f'{table}.arrow'), os.path.join(directory, f'{table}.json')
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_atomic(self, path, write):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _write_meta(self, meta_path, meta):
+        def write(tmp_path):
+            with open(tmp_path, 'w') as f:
+                json.dump(meta, f)
+
+        self._write_atomic(meta_path, write)
+
+    def read(self, xnat_host, project_id, table):
+        """Return the stored table, or None if there is no snapshot."""
+        data_path, _ = self._paths(xnat_host, project_id, table)
+        try:
+            return pd.read_feather(data_path)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, xnat_host, project_id, table, df, fingerprint=None):
+        """Store a table together with the fingerprint it was loaded against."""
+        data_path, meta_path = self._paths(xnat_host, project_id, table)
+        self._write_atomic(data_path, df.reset_index(drop=True).to_feather)
+
+        now = time.time()
+        self._write_meta(meta_path, {'created': now, 'checked': now, 'fingerprint': fingerprint})
+
+    def read_batches(self, xnat_host, project_id, table, batch_size):
+        """Return the stored table as a list of DataFrames of up to ``batch_size`` rows, or None."""
+        data_path, _ = self._paths(xnat_host, project_id, table)
+        try:
+            with pa.ipc.open_file(pa.memory_map(data_path)) as reader:
+                stored = reader.read_all()
+        except (OSError, ValueError):
+            return None
+        # An empty table still comes back as one empty batch with its columns
+        return [batch.to_pandas() for batch in stored.to_batches(max_chunksize=batch_size)] or [stored.to_pandas()]
+
+    def write_batches(self, xnat_host, project_id, table, batches, fingerprint=None):
+        """
+        Pass DataFrame batches through while appending them to a new snapshot.
+
+        The snapshot replaces the stored one only once every batch has been
+        written; if the consumer stops early or the loader fails, it is discarded.
+        """
+        data_path, meta_path = self._paths(xnat_host, project_id, table)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(data_path), suffix='.tmp')
+        os.close(fd)
+
+        writer = None
+        categories = {}
+        try:
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                for df in batches:
+                    df = _grow_categories(df, categories)
+                    arrow = pa.Table.from_pandas(df, preserve_index=False)
+                    if writer is None:
+                        schema = _stream_schema(arrow.schema)
+                        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+                        writer = pa.ipc.new_file(sink, schema, options=options)
+                    writer.write_table(arrow.cast(schema))
+                    yield df
+
+                if writer is None:
+                    # Without a batch there is no schema to store; the next call loads again
+                    return
+                writer.close()
+            os.replace(tmp_path, data_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        now = time.time()
+        self._write_meta(meta_path, {'created': now, 'checked': now, 'fingerprint': fingerprint})
+
+    def invalidate(self, xnat_host, project_id, table):
+        for path in self._paths(xnat_host, project_id, table):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _check(self, xnat_host, project_id, table, fingerprint):
+        """
+        Return ``(True, None)`` if the stored table may be used, otherwise ``(False, current fingerprint)``.
+
+        ``fingerprint`` is a callable that is only invoked once the snapshot is older than the TTL.
+        """
+        data_path, meta_path = self._paths(xnat_host, project_id, table)
+        meta = self._read_meta(meta_path)
+        if meta is None or not os.path.exists(data_path):
+            return False, fingerprint()
+
+        if time.time() - meta['checked'] < self.ttl:
+            return True, None
+
+        current = fingerprint()
+        if current != meta['fingerprint']:
+            return False, current
+
+        meta['checked'] = time.time()
+        self._write_meta(meta_path, meta)
+        return True, None
+
+    def get_or_load(self, xnat_host, project_id, table, loader, fingerprint):
+        """Return a table from disk if it is still valid, otherwise call ``loader`` and store the result."""
+        valid, current = self._check(xnat_host, project_id, table, fingerprint)
+        if valid:
+            df = self.read(xnat_host, project_id, table)
+            if df is not None:
+                return df
+            current = fingerprint()
+
+        df = loader()
+        self.write(xnat_host, project_id, table, df, fingerprint=current)
+        return df
+
+    def iter_or_load(self, xnat_host, project_id, table, load_batches, fingerprint, batch_size):
+        """
+        Like ``get_or_load``, but yield the table in DataFrame batches.
+
+        ``load_batches`` returns an iterable of DataFrames; they are stored as they pass through.
+        """
+        valid, current = self._check(xnat_host, project_id, table, fingerprint)
+        if valid:
+            batches = self.read_batches(xnat_host, project_id, table, batch_size)
+            if batches is not None:
+                yield from batches
+                return
+            current = fingerprint()
+
+        yield from self.write_batches(xnat_host, project_id, table, load_batches(), fingerprint=current)
+
+
+@functools.lru_cache(maxsize=None)
+def default_store():
+    """The process-wide store configured from ``DASHBOARD_CACHE_DIR`` and ``DASHBOARD_SNAPSHOT_TTL``."""
+    return SnapshotStore()
@@ -0,0 +1,101 @@
+"""
+Counts and basic metadata for a project's overview header.
+
+``len(project.subjects)`` and ``len(project.experiments)`` build an XNATpy
+object for every row just to count them. The summary instead reads the
+project document and two ID-only listings concurrently, and keeps the result
+for a few minutes so every page of the process can reuse it.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+from .fetch import default_engine
+
+DEFAULT_TTL = 300
+
+ProjectSummary = namedtuple(
+    'ProjectSummary',
+    ['id', 'name', 'description', 'last_modified', 'subject_count', 'experiment_count'],
+)
+
+
+def count_listing(connection, path):
+    """Number of rows in an XNAT listing, requesting only the ID column."""
+    result = connection.get_json(path, query={'format': 'json', 'columns': 'ID'})['ResultSet']
+    return int(result.get('totalRecords') or len(result['Result']))
+
+
+class PendingSummary:
+    """A project summary whose requests are in flight; ``result()`` waits for them."""
+
+    def __init__(self, project_id, document, subjects, experiments):
+        self.project_id = project_id
+        self.started = time.monotonic()
+        self._futures = (document, subjects, experiments)
+
+    def done(self):
+        return all(future.done() for future in self._futures)
+
+    def failed(self):
+        return any(future.done() and future.exception() is not None for future in self._futures)
+
+    def _document_item(self, timeout=None):
+        document = self._futures[0].result(timeout)
+        return (document.get('items') or [{}])[0]
+
+    def name(self, timeout=None):
+        """The project's name, waiting only for the project document and not for the listings."""
+        return self._document_item(timeout).get('data_fields', {}).get('name', self.project_id)
+
+    def result(self, timeout=None):
+        subjects, experiments = (future.result(timeout) for future in self._futures[1:])
+        item = self._document_item(timeout)
+        fields = item.get('data_fields', {})
+
+        return ProjectSummary(
+            id=self.project_id,
+            name=fields.get('name', self.project_id),
+            description=fields.get('description', ''),
+            last_modified=item.get('meta', {}).get('last_modified'),
+            subject_count=subjects,
+            experiment_count=experiments,
+        )
+
+
+def request_project_summary(connection, project_id, engine=None):
+    """Start the summary requests on a FetchEngine and return without waiting for them."""
+    engine = engine or default_engine()
+    return PendingSummary(
+        project_id,
+        engine.submit(connection.get_json, f'/data/projects/{project_id}', query={'format': 'json'}),
+        engine.submit(count_listing, connection, f'/data/projects/{project_id}/subjects'),
+        engine.submit(count_listing, connection, f'/data/projects/{project_id}/experiments'),
+    )
+
+
+_summaries = {}
+_summaries_lock = threading.Lock()
+
+
+def project_summary(connection, xnat_host, project_id, ttl=None, engine=None):
+    """
+    The cached summary of a project, as a PendingSummary; call ``result()`` where the counts are needed.
+
+    Summaries are shared by every connection to ``xnat_host`` and reused for
+    ``DASHBOARD_SUMMARY_TTL`` seconds (300 by default); a failed one is
+    requested again on the next call, and expired ones are dropped.
+    """
+    ttl = float(ttl if ttl is not None else os.getenv('DASHBOARD_SUMMARY_TTL', DEFAULT_TTL))
+    key = (xnat_host, project_id)
+
+    with _summaries_lock:
+        now = time.monotonic()
+        for expired in [old for old, pending in _summaries.items() if now - pending.started > ttl]:
+            del _summaries[expired]
+
+        pending = _summaries.get(key)
+        if pending is None or pending.failed():
+            pending = _summaries[key] = request_project_summary(connection, project_id, engine)
+        return pending
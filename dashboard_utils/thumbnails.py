@@ -0,0 +1,92 @@
+"""
+Memory-mapped thumbnail pyramid for DICOM slices.
+
+Each slice is decoded once and stored as 512, 256 and 128 px ``.npy`` files in
+the local cache directory. Later renders open those files with
+``mmap_mode='r'``, so every viewer of a session shares the same page cache
+instead of holding its own decoded copy.
+"""
+import functools
+import math
+import os
+import tempfile
+
+import numpy as np
+
+from .snapshot import DEFAULT_CACHE_DIR, _slug, host_key
+
+PYRAMID_SIZES = (512, 256, 128)
+
+
+def downsample(pixels, size):
+    """Shrink an image by block averaging so its longest side is at most ``size`` pixels."""
+    factor = math.ceil(max(pixels.shape[:2]) / size)
+    if factor <= 1:
+        return pixels
+
+    height = pixels.shape[0] // factor * factor
+    width = pixels.shape[1] // factor * factor
+    blocks = pixels[:height, :width].reshape(height // factor, factor, width // factor, factor, *pixels.shape[2:])
+    averaged = blocks.mean(axis=(1, 3))
+
+    if np.issubdtype(pixels.dtype, np.integer):
+        averaged = np.rint(averaged)
+    return averaged.astype(pixels.dtype)
+
+
+def pyramid_level(rows, cols, width=1536):
+    """Smallest pyramid size that still fills a tile of a ``width`` pixel wide montage."""
+    tile = width / max(rows, cols)
+    fitting = [size for size in PYRAMID_SIZES if size >= tile]
+    return min(fitting) if fitting else max(PYRAMID_SIZES)
+
+
+class ThumbnailStore:
+    """Pyramid levels of decoded slices, keyed by host, project, session, scan and file name."""
+
+    def __init__(self, root=None):
+        self.root = root or os.path.join(os.getenv('DASHBOARD_CACHE_DIR', DEFAULT_CACHE_DIR), 'thumbnails')
+
+    def path(self, xnat_host, project_id, session, scan_id, file_name, size):
+        return os.path.join(
+            self.root, host_key(xnat_host), _slug(project_id), _slug(session), _slug(scan_id),
+            f'{_slug(file_name)}.{size}.npy',
+        )
+
+    def get(self, xnat_host, project_id, session, scan_id, file_name, size):
+        """Return a read-only memory map of a stored level, or None."""
+        try:
+            return np.load(self.path(xnat_host, project_id, session, scan_id, file_name, size), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def put(self, xnat_host, project_id, session, scan_id, file_name, pixels):
+        """Store every pyramid level of a decoded slice."""
+        level = pixels
+        for size in sorted(PYRAMID_SIZES, reverse=True):
+            level = downsample(level, size)
+            path = self.path(xnat_host, project_id, session, scan_id, file_name, size)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, np.ascontiguousarray(level))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def get_or_create(self, xnat_host, project_id, session, scan_id, file_name, size, decode):
+        """Return a stored level, calling ``decode()`` for the full-resolution pixels on a miss."""
+        level = self.get(xnat_host, project_id, session, scan_id, file_name, size)
+        if level is None:
+            self.put(xnat_host, project_id, session, scan_id, file_name, decode())
+            level = self.get(xnat_host, project_id, session, scan_id, file_name, size)
+        return level
+
+
+@functools.lru_cache(maxsize=None)
+def default_thumbnail_store():
+    """The process-wide store under ``DASHBOARD_CACHE_DIR``."""
+    return ThumbnailStore()
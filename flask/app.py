@@ -1,23 +1,159 @@
 import argparse
+import gzip
+import hashlib
+import json
 import os
-from flask import Flask
+import sys
+import threading
+import time
+
+import pandas as pd
+import xnat
+from flask import Flask, Response, request
+from xnat.exceptions import XNATResponseError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dashboard_utils.aggregates import CohortSummary
+from dashboard_utils.cache import ByteLRUCache
+from dashboard_utils.demographics import shared_subject_demographics
+from dashboard_utils.gateway import ARROW_STREAM, encode_frame
+from dashboard_utils.metrics import instrument_connection, render_prometheus, traced
+from dashboard_utils.series import list_scan_files
+from dashboard_utils.sessions import load_experiments
+from dashboard_utils.shared import default_shared_store
 
 # Create a Flask app instance
 app = Flask(__name__)
 
+# XNAT setup
+xnat_host = os.getenv('XNAT_HOST')
+xnat_user = os.getenv('XNAT_USER')
+xnat_password = os.getenv('XNAT_PASS')
+# The gateway reads XNAT with its own account, so it only serves the project it was started for
+served_project = os.getenv('XNAT_ITEM_ID')
+
+# Encoded responses are reused for this many seconds before the data is read again
+response_ttl = int(os.getenv('DASHBOARD_GATEWAY_TTL', 300))
+responses = ByteLRUCache(
+    int(float(os.getenv('DASHBOARD_GATEWAY_CACHE_MB', 256)) * 2 ** 20),
+    sizeof=lambda entry: len(entry[1]),
+)
+
+connection = None
+connection_lock = threading.Lock()
+
+def get_connection():
+    # One XNAT connection for the whole gateway process, opened on first use
+    global connection
+    with connection_lock:
+        if connection is None:
+            connection = instrument_connection(
+                xnat.connect(xnat_host, user=xnat_user, password=xnat_password), 'flask-gateway'
+            )
+        return connection
+
+def encode_body(build, compress):
+    body = build()
+    if compress:
+        # mtime=0 keeps the bytes, and so the ETag, identical for identical data
+        body = gzip.compress(body, compresslevel=6, mtime=0)
+    return time.time(), body, hashlib.sha1(body).hexdigest()
+
+def cached_response(key, mimetype, build):
+    ''' Serves the bytes returned by build() from the response cache, with ETag and gzip support '''
+    compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+    cache_key = (key, mimetype, compress)
+
+    entry = responses.get_or_create(cache_key, lambda: encode_body(build, compress))
+    if time.time() - entry[0] > response_ttl:
+        entry = encode_body(build, compress)
+        responses.put(cache_key, entry)
+    _, body, etag = entry
+
+    response = Response(body, mimetype=mimetype)
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.update(['Accept', 'Accept-Encoding'])
+    response.cache_control.no_cache = True
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+def frame_response(key, load):
+    ''' Serves a table as Arrow IPC or compact JSON '''
+    if ARROW_STREAM in request.headers.get('Accept', ''):
+        return cached_response(key, ARROW_STREAM, lambda: encode_frame(load(), 'arrow'))
+    return cached_response(key, 'application/json', lambda: encode_frame(load(), 'json'))
+
+@app.before_request
+def only_served_project():
+    ''' Answers 404 for any project other than XNAT_ITEM_ID, as if it did not exist '''
+    project_id = (request.view_args or {}).get('project_id')
+    if project_id is not None and project_id != served_project:
+        return Response('Unknown project', status=404)
+
 # Define a route for the root URL ("/")
 @app.route('/')
 def hello_world():
-    project_id = os.getenv('XNAT_ITEM_ID')
-    return f"Flask app for project {project_id}"
+    return f"Flask app for project {served_project}"
+
+@app.route('/api/projects/<project_id>/subjects')
+@traced('subjects', dashboard='flask-gateway')
+def subjects(project_id):
+    return frame_response(
+        ('subjects', project_id),
+        lambda: shared_subject_demographics(get_connection(), xnat_host, project_id),
+    )
+
+@app.route('/api/projects/<project_id>/subjects/summary')
+@traced('subject_summary', dashboard='flask-gateway')
+def subject_summary(project_id):
+    # Age histogram and gender counts only, a few hundred bytes regardless of project size
+    return cached_response(
+        ('subject-summary', project_id),
+        'application/json',
+        lambda: json.dumps(CohortSummary.from_frame(
+            shared_subject_demographics(get_connection(), xnat_host, project_id)
+        ).to_dict()).encode(),
+    )
+
+@app.route('/api/projects/<project_id>/experiments')
+@traced('experiments', dashboard='flask-gateway')
+def experiments(project_id):
+    return frame_response(
+        ('experiments', project_id),
+        lambda: default_shared_store().get_or_publish(
+            xnat_host, project_id, 'experiments',
+            load=lambda: load_experiments(get_connection(), project_id),
+        ),
+    )
+
+@app.route('/api/projects/<project_id>/experiments/<session>/scans/<scan_id>/files')
+@traced('scan_files', dashboard='flask-gateway')
+def scan_files(project_id, session, scan_id):
+    return frame_response(
+        ('files', project_id, session, scan_id),
+        lambda: pd.DataFrame(
+            list_scan_files(get_connection(), project_id, session, scan_id),
+            columns=['name', 'uri', 'size'],
+        ),
+    )
+
+@app.route('/metrics')
+def metrics():
+    # XNAT request counts, bytes and latencies in the Prometheus text format
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.errorhandler(XNATResponseError)
+def xnat_error(error):
+    return f"XNAT request failed: {error}", 502
 
 def main():
-    parser = argparse.ArgumentParser(description='Simple Flask "Hello World" app with a customizable port.')
+    parser = argparse.ArgumentParser(description='Flask gateway serving cached XNAT project data to the dashboards.')
     parser.add_argument('-p', '--port', type=int, default=5000, help='Port number to run the app (default: 5000)')
     args = parser.parse_args()
 
     # Run the Flask app on the specified port
-    app.run(port=args.port)
+    app.run(port=args.port, threaded=True)
 
 if __name__ == '__main__':
     main()
@@ -1,29 +1,45 @@
 import panel as pn
+import holoviews as hv
 import hvplot.pandas
-import pandas as pd
-import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dashboard_utils.datasets import load_dataset
+from dashboard_utils.downsample import downsample_series
+from dashboard_utils.rolling import RollingStats
 
 pn.extension(design='material')
 
-csv_file = ("https://raw.githubusercontent.com/holoviz/panel/main/examples/assets/occupancy.csv")
-data = pd.read_csv(csv_file, parse_dates=["date"], index_col="date")
+data = load_dataset('occupancy')
 
 data.tail()
 
+# Rolling statistics are cached per (variable, window); moving sigma only re-thresholds them
+stats = RollingStats(data)
+
 def transform_data(variable, window, sigma):
     ''' Calculates the rolling average and the outliers '''
-    avg = data[variable].rolling(window=window).mean()
-    residual = data[variable] - avg
-    std = residual.rolling(window=window).std()
-    outliers = np.abs(residual) > std * sigma
-    return avg, avg[outliers]
+    return stats.transform(variable, window, sigma)
+
+# About two points per horizontal pixel of the 400px wide plot
+plot_points = 800
+# At low sigma nearly every point is an outlier, so the markers get a budget of their own
+outlier_points = 400
 
 def create_plot(variable="Temperature", window=30, sigma=10):
     ''' Plots the rolling average and the outliers '''
     avg, highlight = transform_data(variable, window, sigma)
-    return avg.hvplot(height=300, width=400, legend=False) * highlight.hvplot.scatter(
-        color="orange", padding=0.1, legend=False
-    )
+
+    def rolling_average(x_range):
+        ''' Downsamples the visible rolling average and outliers, again whenever the plot is zoomed '''
+        outliers = downsample_series(highlight, outlier_points, x_range=x_range)
+        visible = downsample_series(avg, plot_points, keep=outliers.index, x_range=x_range)
+        return visible.hvplot(height=300, width=400, legend=False) * outliers.hvplot.scatter(
+            color="orange", padding=0.1, legend=False
+        )
+
+    return hv.DynamicMap(rolling_average, streams=[hv.streams.RangeX()])
 
 variable_widget = pn.widgets.Select(name="variable", value="Temperature", options=list(data.columns))
 window_widget = pn.widgets.IntSlider(name="window", value=30, start=1, end=60)
@@ -1,12 +1,21 @@
 import panel as pn
+import asyncio
 import os 
-import pandas as pd
+import sys
+import time
 import xnat
 
-import plotly.express as px
-import hvplot.pandas
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dashboard_utils.aggregates import CohortSummary
+from dashboard_utils.demographics import stream_subject_demographics
+from dashboard_utils.lazy import lazy_import
+from dashboard_utils.metrics import instrument_connection, start_metrics_server, traced
 
-pn.extension('plotly')
+# The charts are drawn once the first subjects arrive, so their libraries load then
+hv = lazy_import('holoviews')
+px = lazy_import('plotly.express')
+
+pn.extension('plotly', 'tabulator')
 
 # XNAT setup
 xnat_host = os.getenv('XNAT_HOST')
@@ -16,22 +25,15 @@ xnat_password = os.getenv('XNAT_PASS')
 project_id = os.environ['XNAT_ITEM_ID']
 
 connection = xnat.connect(xnat_host, user=xnat_user, password=xnat_password, loglevel='INFO')
-project = connection.projects[project_id]
+instrument_connection(connection, 'panel-project-overview')
+start_metrics_server()
 
 def load_subject_data():
+    # Batches of subjects as they arrive from the gateway, the local snapshot or XNAT
+    return stream_subject_demographics(connection, xnat_host, project_id)
 
-    subject_data = {
-        'id': [],
-        'gender': [],
-        'age': []
-    }
-
-    for subject in project.subjects.values():
-        subject_data['id'].append(subject.label)
-        subject_data['gender'].append(subject.demographics.gender)
-        subject_data['age'].append(subject.demographics.age)
-
-    return subject_data
+# While batches are still arriving, the charts are redrawn at most this often (seconds)
+chart_interval = 0.5
 
 
 # Panel setup
@@ -59,40 +61,78 @@ def load_display(x):
         loading.value=False
         loading.visible=False
 
-def display_subject_data():
-    load_display('on')
-
-    subject_data = load_subject_data()
-    df = pd.DataFrame(subject_data)
-    df_pane = pn.pane.DataFrame(df, sizing_mode="stretch_both", max_height=250)
-
-    title = pn.pane.Markdown("### Subjects")
-    main_column.append(title)
-    main_column.append(df_pane)
+def age_histogram(summary):
+    # The bokeh backend has to be loaded before .opts can set plot options
+    import holoviews.plotting.bokeh
 
     # Histogram of age distribution
-    histogram_age = df.hvplot.hist('age', bins=15, height=300)
+    histogram_age = hv.Histogram(summary.age.trimmed())
     histogram_age.opts(xlabel='Age', ylabel='Count')
     histogram_age.opts(width=500, height=300)
+    return histogram_age
 
+def gender_pie(summary):
     # Create pie chart of gender distribution m vs f
-    genders = df['gender'].value_counts()
-    fig = px.pie(df, values=genders.values, names=genders.index)
-
-    main_column.append(
-        pn.Row(
-            pn.Column(
-                pn.pane.Markdown(f"### Subject Age Distribution"),
-                histogram_age
-            ),
-            pn.Column(
-                pn.pane.Markdown(f"### Gender Distribution"),
-                fig
+    labels, counts = summary.gender.labels_and_counts()
+    return px.pie(values=counts, names=labels)
+
+async def display_subject_data():
+    with traced('display_subject_data', dashboard='panel-project-overview'):
+        load_display('on')
+
+        # Bin ages and count genders on the server; the charts only receive the counts
+        summary = CohortSummary()
+
+        title = pn.pane.Markdown("### Subjects")
+        # The table is created from the first batch, so it takes that batch's column types
+        table_column = pn.Column(sizing_mode="stretch_width")
+        table = None
+        histogram_pane = pn.pane.HoloViews(age_histogram(summary))
+        pie_pane = pn.pane.Plotly(gender_pie(summary))
+
+        main_column.append(title)
+        main_column.append(table_column)
+        main_column.append(
+            pn.Row(
+                pn.Column(
+                    pn.pane.Markdown(f"### Subject Age Distribution"),
+                    histogram_pane
+                ),
+                pn.Column(
+                    pn.pane.Markdown(f"### Gender Distribution"),
+                    pie_pane
+                )
             )
         )
-    )
 
-    load_display('off')
+        batches = load_subject_data()
+        drawn = time.monotonic()
+        while True:
+            # Requests and parsing run off the event loop, so each batch reaches the browser as soon as it is ready
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+
+            if table is None:
+                table = pn.widgets.Tabulator(
+                    batch, pagination='remote', page_size=10,
+                    disabled=True, show_index=False, sizing_mode="stretch_width",
+                )
+                table_column.append(table)
+            else:
+                table.stream(batch, follow=False)
+            summary.add(batch)
+            title.object = f"### Subjects ({summary.subjects})"
+            load_display('off')
+
+            if time.monotonic() - drawn > chart_interval:
+                histogram_pane.object = age_histogram(summary)
+                pie_pane.object = gender_pie(summary)
+                drawn = time.monotonic()
+
+        histogram_pane.object = age_histogram(summary)
+        pie_pane.object = gender_pie(summary)
+        load_display('off')
 
 pn.state.onload(display_subject_data)
 
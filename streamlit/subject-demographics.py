@@ -3,8 +3,16 @@ import numpy
 import streamlit as st
 import xnat
 import os
-import plotly.express as px
-import matplotlib.pyplot as plt
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dashboard_utils.demographics import get_subject_demographics, get_subject_summary
+from dashboard_utils.lazy import lazy_import
+from dashboard_utils.metrics import instrument_connection, start_metrics_server, traced
+
+# Charting libraries are loaded when the first chart is drawn
+px = lazy_import('plotly.express')
+plt = lazy_import('matplotlib.pyplot')
 
 # # For local testing
 # os.environ['JUPYTERHUB_USER'] = 'admin'
@@ -21,35 +29,30 @@ xnat_password = os.getenv('XNAT_PASS')
 
 project_id = os.getenv('XNAT_ITEM_ID')
 
-connection = xnat.connect(xnat_host, user=xnat_user, password=xnat_password)
-project = connection.projects[project_id]
+# Streamlit re-runs this script on every widget interaction. The connection is
+# created once per server process and the subject table is shared by all
+# browser sessions until it expires, so reruns do not talk to XNAT. The table
+# is returned as-is rather than copied per session: it is a read-only view of
+# the compact copy in shared memory.
+subject_data_ttl = int(os.getenv('DASHBOARD_SUBJECT_TTL', 600))
 
-# Cache for subject data
-subject_data_cache = None
+@st.cache_resource
+def get_connection():
+    start_metrics_server()
+    connection = xnat.connect(xnat_host, user=xnat_user, password=xnat_password)
+    return instrument_connection(connection, 'streamlit-subject-demographics')
 
 # Compile subject data or return cached data
-def get_subject_data():
-    global subject_data_cache
-    
-    if subject_data_cache is not None:
-        return subject_data_cache
-    
-    subject_data = {
-        'id': [],
-        'gender': [],
-        'age': []
-    }
-
-    for subject in project.subjects.values():
-        subject_data['id'].append(subject.label)
-        subject_data['gender'].append(subject.demographics.gender)
-        subject_data['age'].append(subject.demographics.age)
-        
-    df = pandas.DataFrame(subject_data)
-    
-    subject_data_cache = df
-
-    return df
+@st.cache_resource(ttl=subject_data_ttl, show_spinner="Loading subject data from XNAT...")
+@traced('get_subject_data', dashboard='streamlit-subject-demographics')
+def get_subject_data(project_id):
+    return get_subject_demographics(get_connection(), xnat_host, project_id)
+
+# Age bins and gender counts are computed here or by the gateway, so the charts only receive counts
+@st.cache_data(ttl=subject_data_ttl)
+@traced('get_cohort_summary', dashboard='streamlit-subject-demographics')
+def get_cohort_summary(project_id):
+    return get_subject_summary(get_connection(), xnat_host, project_id)
 
 # Start Streamlit
 
@@ -60,13 +63,17 @@ st.write("This is a demo of a Streamlit app that shows subject demographics for
 st.markdown("### Subject data")
 
 # Show a table of subject data
-df = get_subject_data()
+df = get_subject_data(project_id)
 st.dataframe(df, width=700, height=300)
 
+summary = get_cohort_summary(project_id)
+
 # Histogram of ages
 st.markdown("## Histogram of ages")
 st.markdown("### Using Plotly")
-fig1 = px.histogram(df, x="age")
+edges = summary['age']['edges']
+bin_centers = [(low + high) / 2 for low, high in zip(edges[:-1], edges[1:])]
+fig1 = px.bar(x=bin_centers, y=summary['age']['counts'], labels={'x': 'age', 'y': 'count'})
 fig1.update_layout(bargap=0.2)
 st.plotly_chart(fig1)
 
@@ -74,7 +81,7 @@ st.plotly_chart(fig1)
 st.markdown("## Pie chart of genders")
 st.markdown("### Using Matplotlib")
 fig2, ax = plt.subplots()
-df['gender'].value_counts().plot.pie(ax=ax, autopct='%1.1f%%')
+ax.pie(summary['gender']['counts'], labels=summary['gender']['labels'], autopct='%1.1f%%')
 st.pyplot(fig2)
 
 